@@ -3,36 +3,110 @@
 
 from pymarc import MARCReader
 from pymarc import exceptions as exc
+from multiprocessing import Pool
+import io
+import os
 import sys
 import csv
 
-filename = sys.argv[1]
-recordcount = 0
+# Records are parsed in independent byte ranges of roughly this size
+CHUNK_BYTES = 64 * 1024 * 1024
 
-with open('out.csv', mode='w') as csv_out:
-    csv_writer = csv.writer(csv_out, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+def find_chunk_boundaries(filename, chunk_bytes=CHUNK_BYTES):
+    """
+    Split a MARC file into byte ranges that start and end on record boundaries.
+    
+    Each record's leader begins with its total length in bytes (positions 0-4),
+    so the file can be walked by reading 5 bytes and seeking forward.
+    
+    Returns:
+        list: (start, end) byte offsets for each chunk
+    """
+    ranges = []
+    start = 0
+    offset = 0
+    size = os.path.getsize(filename)
 
     with open(filename, 'rb') as fh:
-        reader = MARCReader(fh)
-        for record in reader:
-            if record:
-                mms = record['001'].format_field()
-                title = record['245'].format_field()
-                pub = record.publisher
-                pubyear = record.pubyear
-                # try:
-                #     pub = record['260'].format_field()
-                # except:
-                #     pub = record['264'].format_field()
-                try:
-                    bibno = record['907']['a']
-                except:
-                    bibno = "MISSING"
+        while offset < size:
+            fh.seek(offset)
+            leader = fh.read(5)
+            try:
+                record_length = int(leader)
+            except ValueError:
+                # Corrupt leader - leave the remainder to the final chunk
+                break
+            if record_length <= 0:
+                break
+            offset += record_length
+            if offset - start >= chunk_bytes:
+                ranges.append((start, offset))
+                start = offset
+
+    if start < size:
+        ranges.append((start, size))
+
+    return ranges
+
+
+def convert_chunk(task):
+    """
+    Parse one byte range of the MARC file into CSV rows (runs in a worker process).
+    """
+    filename, start, end, verbose = task
+    rows = []
+
+    with open(filename, 'rb') as fh:
+        fh.seek(start)
+        buf = fh.read(end - start)
+
+    reader = MARCReader(io.BytesIO(buf))
+    for record in reader:
+        if record:
+            f001 = record.get('001')
+            f245 = record.get('245')
+            mms = f001.format_field() if f001 is not None else ""
+            title = f245.format_field() if f245 is not None else ""
+            pub = record.publisher
+            pubyear = record.pubyear
+            # try:
+            #     pub = record['260'].format_field()
+            # except:
+            #     pub = record['264'].format_field()
+            f907 = record.get('907')
+            bibno = f907['a'] if f907 is not None and 'a' in f907 else "MISSING"
+            if verbose:
                 print(bibno)
-                csv_writer.writerow([mms, bibno, title, pub, pubyear])
-            elif isinstance(reader.current_exception, exc.FatalReaderError):
-                print(reader.current_exception)
-                print(reader.current_chunk)
-            else:
-                print(reader.current_exception)
-                print(reader.current_chunk)
\ No newline at end of file
+            rows.append([mms, bibno, title, pub, pubyear])
+        elif isinstance(reader.current_exception, exc.FatalReaderError):
+            print(reader.current_exception)
+            print(reader.current_chunk)
+        else:
+            print(reader.current_exception)
+            print(reader.current_chunk)
+
+    return rows
+
+
+def main():
+    filename = sys.argv[1]
+    verbose = '--verbose' in sys.argv[2:]
+    recordcount = 0
+
+    tasks = [(filename, start, end, verbose) for start, end in find_chunk_boundaries(filename)]
+
+    with open('out.csv', mode='w', buffering=1 << 20, newline='') as csv_out:
+        csv_writer = csv.writer(csv_out, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+        # imap keeps chunks in file order so output matches a sequential run
+        with Pool() as pool:
+            for rows in pool.imap(convert_chunk, tasks):
+                csv_writer.writerows(rows)
+                recordcount += len(rows)
+
+    print(f"Wrote {recordcount} records to out.csv")
+
+
+if __name__ == "__main__":
+    main()
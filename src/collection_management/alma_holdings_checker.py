@@ -1,13 +1,193 @@
 import requests
-import pandas as pd
+import csv
 import sys
 import os
 import time
 import json
+import hashlib
+import sqlite3
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import batched
 from urllib.parse import quote
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def get_holdings_from_api(mms_id, api_key, base_url="https://api-na.hosted.exlibrisgroup.com/almaws/v1"):
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+# Alma allows roughly 25 requests/second per API key. Start below that and let
+# the rate limiter adapt to the 429s we actually see.
+INITIAL_REQUESTS_PER_SECOND = 10
+MAX_REQUESTS_PER_SECOND = 25
+MIN_REQUESTS_PER_SECOND = 1
+# Successful requests needed before the rate is raised by one request/second
+RATE_INCREASE_INTERVAL = 100
+MAX_WORKERS = 16
+MAX_RETRIES = 5
+# Location code prefixes treated as suppressed (a tuple for str.startswith)
+SUPPRESSED_PATTERNS = ("olwdfy", "olweed", "oldeleted")
+# The Bibs API accepts up to 100 comma-separated MMS IDs per request
+BATCH_SIZE = 100
+CACHE_FILENAME = 'alma_holdings_cache.sqlite'
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+class RateLimiter:
+    """
+    Thread-safe token bucket used to cap the request rate across worker threads.
+    
+    The rate adapts AIMD-style: it halves whenever the server rate-limits us and
+    grows by one request/second after every RATE_INCREASE_INTERVAL successes.
+    """
+    
+    def __init__(self, rate, min_rate=MIN_REQUESTS_PER_SECOND, max_rate=MAX_REQUESTS_PER_SECOND):
+        """
+        Args:
+            rate (float): Initial tokens added per second (i.e. requests per second)
+            min_rate (float): Lower bound for the adaptive rate
+            max_rate (float): Upper bound for the adaptive rate
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = rate
+        self.successes = 0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def record_success(self):
+        """
+        Additively increase the rate after a run of successful requests.
+        """
+        with self.lock:
+            self.successes += 1
+            if self.successes >= RATE_INCREASE_INTERVAL:
+                self.successes = 0
+                self.rate = min(self.max_rate, self.rate + 1)
+    
+    def record_throttled(self):
+        """
+        Multiplicatively decrease the rate after a 429 response.
+        """
+        with self.lock:
+            self.successes = 0
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, self.rate)
+            logger.debug("Rate limited by Alma, slowing to %.1f requests/second", self.rate)
+    
+    def record_response(self, response):
+        """
+        Feed a response back into the rate, including any 429s urllib3 retried.
+        """
+        retries = getattr(response.raw, 'retries', None)
+        history = retries.history if retries is not None else ()
+        
+        if response.status_code == 429 or any(attempt.status == 429 for attempt in history):
+            self.record_throttled()
+        else:
+            self.record_success()
+    
+    def acquire(self):
+        """
+        Block until a token is available, then consume it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                wait = (1 - self.tokens) / self.rate
+            
+            time.sleep(wait)
+
+rate_limiter = RateLimiter(INITIAL_REQUESTS_PER_SECOND)
+
+# Shared session so worker threads reuse pooled keep-alive connections.
+# Rate-limited (429/503) responses wait for the server's Retry-After when given,
+# otherwise back off exponentially with jitter so threads don't retry in lockstep.
+session = requests.Session()
+session.headers.update({
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate'
+})
+session.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_WORKERS,
+    max_retries=Retry(
+        total=MAX_RETRIES,
+        backoff_factor=1.0,
+        backoff_jitter=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
+
+class HoldingsCache:
+    """
+    On-disk SQLite cache of holdings API responses keyed by MMS ID.
+    
+    Holdings rarely change day-to-day, so re-runs within the TTL are served
+    locally instead of hitting the API again.
+    """
+    
+    def __init__(self, path, ttl=CACHE_TTL_SECONDS):
+        """
+        Args:
+            path (str): Path to the SQLite cache file
+            ttl (int): Seconds before a cached response is considered stale
+        """
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS holdings "
+            "(mms_id TEXT PRIMARY KEY, fetched_at REAL, body TEXT)"
+        )
+        self.conn.commit()
+    
+    def get(self, mms_id):
+        """
+        Look up a cached response.
+        
+        Returns:
+            tuple: (found, body) - body is the raw JSON text, or None for cached 404s
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT fetched_at, body FROM holdings WHERE mms_id = ?", (mms_id,)
+            ).fetchone()
+        
+        if row is None or time.time() - row[0] > self.ttl:
+            return False, None
+        
+        return True, row[1]
+    
+    def set(self, mms_id, body):
+        """
+        Store a raw response body (or None for a missing MMS ID).
+        """
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO holdings (mms_id, fetched_at, body) VALUES (?, ?, ?)",
+                (mms_id, time.time(), body)
+            )
+            self.conn.commit()
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def get_holdings_from_api(mms_id, api_key, base_url="https://api-na.hosted.exlibrisgroup.com/almaws/v1",
+                          cache=None):
     """
     Retrieve holdings for a specific MMS ID using the Alma API.
     
@@ -15,51 +195,180 @@ def get_holdings_from_api(mms_id, api_key, base_url="https://api-na.hosted.exlib
         mms_id (str): The MMS ID to check
         api_key (str): Your Alma API key
         base_url (str): Base URL for Alma API
+        cache (HoldingsCache): Optional on-disk response cache
         
     Returns:
-        dict: API response containing holdings data, or None if error
+        tuple: (digest, body) where body is the raw JSON response text and
+               digest identifies it, or (None, None) if error
     """
+    if cache is not None:
+        found, body = cache.get(mms_id)
+        if found:
+            return (digest_holdings_body(body), body) if body is not None else (None, None)
+    
     url = f"{base_url}/bibs/{mms_id}/holdings"
     
+    # Only location codes are needed, so ask for the brief representation
     params = {
         'apikey': api_key,
-        'format': 'json'
+        'format': 'json',
+        'view': 'brief'
     }
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        rate_limiter.acquire()
+        response = session.get(url, params=params, timeout=30)
+        rate_limiter.record_response(response)
         
         if response.status_code == 200:
-            return response.json()
+            if cache is not None:
+                cache.set(mms_id, response.text)
+            return digest_holdings_body(response.text), response.text
         elif response.status_code == 404:
-            print(f"  Warning: MMS ID {mms_id} not found")
-            return None
-        elif response.status_code == 429:
-            print(f"  Rate limit hit, waiting 5 seconds...")
-            time.sleep(5)
-            return get_holdings_from_api(mms_id, api_key, base_url)  # Retry
+            logger.warning("  Warning: MMS ID %s not found", mms_id)
+            if cache is not None:
+                cache.set(mms_id, None)
+            return None, None
         else:
-            print(f"  API Error for {mms_id}: {response.status_code} - {response.text}")
-            return None
+            logger.error("  API Error for %s: %s - %s", mms_id, response.status_code, response.text)
+            return None, None
             
     except requests.exceptions.RequestException as e:
-        print(f"  Request error for {mms_id}: {str(e)}")
-        return None
+        logger.error("  Request error for %s: %s", mms_id, e)
+        return None, None
 
-def extract_locations_from_holdings(holdings_data):
+def get_holdings_batch(mms_ids, api_key, base_url="https://api-na.hosted.exlibrisgroup.com/almaws/v1",
+                       cache=None):
     """
-    Extract location codes from the holdings API response.
+    Retrieve holding locations for up to 100 MMS IDs in a single Bibs API call.
+    
+    Uses expand=p_avail so each bib record carries AVA (physical availability)
+    fields, whose subfield j is the location code. Locations are returned as a
+    holdings-shaped JSON body so is_all_suppressed and the cache can be reused.
+    Bibs the batch response leaves out, or whose MARC XML can't be parsed, are
+    looked up one at a time with get_holdings_from_api.
     
     Args:
-        holdings_data (dict): The JSON response from the holdings API
+        mms_ids (list): MMS IDs to look up (at most BATCH_SIZE)
+        api_key (str): Your Alma API key
+        base_url (str): Base URL for Alma API
+        cache (HoldingsCache): Optional on-disk response cache
         
     Returns:
-        list: List of location codes found in the holdings
+        dict: MMS ID -> (digest, body), with (None, None) for missing IDs or errors
+    """
+    results = {}
+    pending = []
+    
+    for mms_id in mms_ids:
+        if cache is not None:
+            found, body = cache.get(mms_id)
+            if found:
+                results[mms_id] = (digest_holdings_body(body), body) if body is not None else (None, None)
+                continue
+        pending.append(mms_id)
+    
+    if not pending:
+        return results
+    
+    params = {
+        'apikey': api_key,
+        'format': 'json',
+        'mms_id': ','.join(pending),
+        'expand': 'p_avail'
+    }
+    
+    try:
+        rate_limiter.acquire()
+        response = session.get(f"{base_url}/bibs", params=params, timeout=60)
+        rate_limiter.record_response(response)
+        
+        if response.status_code != 200:
+            logger.error("  API Error for batch starting at %s: %s - %s", pending[0], response.status_code, response.text)
+            results.update((mms_id, (None, None)) for mms_id in pending)
+            return results
+        
+        bibs = response.json().get('bib', [])
+        
+    except requests.exceptions.RequestException as e:
+        logger.error("  Request error for batch starting at %s: %s", pending[0], e)
+        results.update((mms_id, (None, None)) for mms_id in pending)
+        return results
+    
+    bodies = {}
+    for bib in bibs:
+        mms_id = str(bib.get('mms_id'))
+        try:
+            locations = extract_ava_locations(bib)
+        except ET.ParseError as e:
+            logger.error("  Could not parse MARC XML for %s: %s", mms_id, e)
+            continue
+        holdings = [{'location': {'value': code}} for code in locations]
+        bodies[mms_id] = json.dumps({'holding': holdings})
+    
+    for mms_id in pending:
+        body = bodies.get(mms_id)
+        if body is None:
+            # Not in the batch response; the holdings API reports it as missing or errored
+            results[mms_id] = get_holdings_from_api(mms_id, api_key, base_url, cache=cache)
+            continue
+        if cache is not None:
+            cache.set(mms_id, body)
+        results[mms_id] = (digest_holdings_body(body), body)
+    
+    return results
+
+def extract_ava_locations(bib):
+    """
+    Extract location codes from the AVA fields of a bib record's MARC XML.
+    
+    Args:
+        bib (dict): A bib entry from the Bibs API response (expand=p_avail)
+        
+    Returns:
+        list: Location codes (AVA subfield j), one per holding location
     """
     locations = []
     
+    for marc_xml in bib.get('anies') or []:
+        root = ET.fromstring(marc_xml)
+        for field in root.iter('datafield'):
+            if field.get('tag') != 'AVA':
+                continue
+            for subfield in field.iter('subfield'):
+                if subfield.get('code') == 'j' and subfield.text:
+                    locations.append(subfield.text)
+    
+    return locations
+
+def digest_holdings_body(body):
+    """
+    Compute a short digest of a raw holdings response.
+    
+    Serials and multi-volume sets often return identical payloads, so the
+    digest lets callers skip both JSON decoding and the location check for
+    repeated responses.
+    
+    Args:
+        body (str): Raw JSON text from the holdings API
+        
+    Returns:
+        bytes: 8-byte blake2b digest
+    """
+    return hashlib.blake2b(body.encode('utf-8'), digest_size=8).digest()
+
+def iter_locations(holdings_data):
+    """
+    Lazily yield location codes from the holdings API response.
+    
+    Args:
+        holdings_data (dict): The JSON response from the holdings API
+        
+    Yields:
+        str: Location codes from each holding and any items within it
+    """
     if not holdings_data or 'holding' not in holdings_data:
-        return locations
+        return
     
     holdings = holdings_data['holding']
     if not isinstance(holdings, list):
@@ -70,7 +379,7 @@ def extract_locations_from_holdings(holdings_data):
         if 'location' in holding:
             location_code = holding['location'].get('value', '')
             if location_code:
-                locations.append(location_code)
+                yield location_code
         
         # Also check items within holdings if they exist
         if 'item' in holding:
@@ -81,66 +390,125 @@ def extract_locations_from_holdings(holdings_data):
             for item in items:
                 if 'item_data' in item and 'location' in item['item_data']:
                     location_code = item['item_data']['location'].get('value', '')
-                    if location_code and location_code not in locations:
-                        locations.append(location_code)
+                    if location_code:
+                        yield location_code
+
+def is_all_suppressed(locations, suppressed_patterns):
+    """
+    Check whether every location is suppressed, stopping at the first active one.
     
-    return locations
+    Args:
+        locations (iterable): Location codes, e.g. from iter_locations()
+        suppressed_patterns (tuple): Location prefixes that count as suppressed
+            (a tuple so str.startswith can test them all in one call)
+        
+    Returns:
+        bool: True if all locations are suppressed, False if any location is
+              active, or None if no locations were found
+    """
+    any_seen = False
+    
+    for location_code in locations:
+        if not location_code.startswith(suppressed_patterns):
+            return False
+        any_seen = True
+    
+    return True if any_seen else None
 
-def process_mms_ids_with_api(csv_file_path, api_key, suppressed_patterns=["olwdfy", "olweed", "oldeleted"]):
+def process_mms_ids_with_api(csv_file_path, api_key, suppressed_patterns=SUPPRESSED_PATTERNS,
+                             max_workers=MAX_WORKERS, cache=None, output=None):
     """
     Process MMS IDs from CSV file using Alma API to check holdings.
     
     Args:
         csv_file_path (str): Path to the CSV file with MMS IDs
         api_key (str): Alma API key
-        suppressed_patterns (list): List of patterns to match suppressed locations
+        suppressed_patterns (tuple): Patterns to match suppressed locations
+        max_workers (int): Number of concurrent API requests
+        cache (HoldingsCache): Optional on-disk response cache
+        output (file): Optional open file; each batch's matches are written and
+            flushed as soon as the batch arrives, in completion order
         
     Returns:
-        list: List of MMS IDs where all holdings are in suppressed locations
+        list: List of MMS IDs where all holdings are in suppressed locations,
+              in input order
     """
-    # Read the CSV file (tab-separated)
-    df = pd.read_csv(csv_file_path, sep='\t', header=None)
+    suppressed_patterns = tuple(suppressed_patterns)
     
-    # Get MMS IDs from the second column (index 1) and deduplicate
-    mms_ids = df.iloc[:, 1].astype(str).str.strip().drop_duplicates().tolist()
+    # Stream the tab-separated file, keeping unique MMS IDs from the second column
+    total_records = 0
+    seen = set()
+    mms_ids = []
     
-    print(f"Found {len(df)} total records")
-    print(f"Found {len(mms_ids)} unique MMS IDs to process")
+    with open(csv_file_path, newline='') as f:
+        for row in csv.reader(f, delimiter='\t'):
+            total_records += 1
+            if len(row) < 2:
+                continue
+            mms_id = row[1].strip()
+            if mms_id and mms_id not in seen:
+                seen.add(mms_id)
+                mms_ids.append(mms_id)
     
+    logger.info("Found %d total records", total_records)
+    logger.info("Found %d unique MMS IDs to process", len(mms_ids))
+    
+    # Fetch holdings in batches of up to 100 MMS IDs per request, several
+    # batches at a time; the rate limiter keeps us under the API limit
+    completed = 0
+    batches = [list(batch) for batch in batched(mms_ids, BATCH_SIZE)]
     suppressed_only_mmsids = []
     
-    for index, mms_id in enumerate(mms_ids):
-        print(f"[{index + 1}/{len(mms_ids)}] Checking MMS ID: {mms_id}")
-        
-        # Get holdings from API
-        holdings_data = get_holdings_from_api(mms_id, api_key)
-        
-        if holdings_data is None:
-            continue
-        
-        # Extract locations
-        locations = extract_locations_from_holdings(holdings_data)
-        
-        if not locations:
-            print(f"  No locations found")
-            continue
-        
-        print(f"  Locations found: {', '.join(locations)}")
-        
-        # Check if ALL locations match any of the suppressed patterns
-        all_suppressed = all(
-            any(location.startswith(pattern) for pattern in suppressed_patterns) 
-            for location in locations
-        )
-        
-        if all_suppressed:
-            suppressed_only_mmsids.append(mms_id)
-            print(f"  ✓ ALL holdings in suppressed locations - ADDED TO LIST")
-        else:
-            print(f"  ✗ Has active holdings - skipped")
+    # Results of is_all_suppressed keyed by response digest
+    results_by_digest = {}
+    
+    # No point starting more threads than there are batches to fetch
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+        futures = {
+            executor.submit(get_holdings_batch, batch, api_key, cache=cache): batch
+            for batch in batches
+        }
         
-        # Be nice to the API - small delay between requests
-        time.sleep(0.5)
+        # Evaluate each batch as it arrives so an interrupted run keeps what it found
+        for future in as_completed(futures):
+            batch_results = future.result()
+            completed += len(batch_results)
+            logger.info("[%d/%d] Retrieved holdings for %d MMS IDs", completed, len(mms_ids), len(batch_results))
+            
+            batch_matches = []
+            for mms_id in futures[future]:
+                digest, body = batch_results.get(mms_id, (None, None))
+                
+                if body is None:
+                    continue
+                
+                logger.debug("Checking MMS ID: %s", mms_id)
+                
+                if digest in results_by_digest:
+                    all_suppressed = results_by_digest[digest]
+                else:
+                    # Decode only payloads we haven't already evaluated
+                    all_suppressed = is_all_suppressed(iter_locations(json.loads(body)), suppressed_patterns)
+                    results_by_digest[digest] = all_suppressed
+                
+                if all_suppressed is None:
+                    logger.debug("  No locations found")
+                    continue
+                
+                if all_suppressed:
+                    batch_matches.append(mms_id)
+                    logger.debug("  ✓ ALL holdings in suppressed locations - ADDED TO LIST")
+                else:
+                    logger.debug("  ✗ Has active holdings - skipped")
+            
+            suppressed_only_mmsids.extend(batch_matches)
+            if output is not None and batch_matches:
+                output.write(''.join(f"{mms_id}\n" for mms_id in batch_matches))
+                output.flush()
+    
+    # Batches finish in any order; report matches in input order
+    position = {mms_id: i for i, mms_id in enumerate(mms_ids)}
+    suppressed_only_mmsids.sort(key=position.__getitem__)
     
     return suppressed_only_mmsids
 
@@ -151,14 +519,23 @@ def main():
     # Load environment variables from .env file
     load_dotenv()
     
-    if len(sys.argv) != 2:
-        print("Usage: python alma_api_holdings_checker.py <csv_file_path>")
+    args = sys.argv[1:]
+    verbose = '--verbose' in args
+    if verbose:
+        args.remove('--verbose')
+    
+    if len(args) != 1:
+        print("Usage: python alma_api_holdings_checker.py <csv_file_path> [--verbose]")
         print("Example: python alma_api_holdings_checker.py 'Weededbarcodes.csv'")
         print("\nNote: Make sure ALMA_API_KEY is set in your .env file")
         print("CSV file should be tab-separated with MMS IDs in the second column")
+        print("Use --verbose to show the result for each MMS ID")
         sys.exit(1)
     
-    csv_file = sys.argv[1]
+    csv_file = args[0]
+    
+    if verbose:
+        logger.setLevel(logging.DEBUG)
     
     # Get API key from environment variable
     api_key = os.getenv('ALMA_API_KEY')
@@ -173,38 +550,45 @@ def main():
         print(f"Error: File '{csv_file}' not found.")
         sys.exit(1)
     
-    print(f"Processing CSV file: {csv_file}")
-    print("Using Alma API to check holdings for each MMS ID...")
-    print("Looking for titles with ALL holdings in suppressed locations (olwdfy, olweed, oldeleted patterns)")
-    print("=" * 70)
+    logger.info("Processing CSV file: %s", csv_file)
+    logger.info("Using Alma API to check holdings for each MMS ID...")
+    logger.info("Looking for titles with ALL holdings in suppressed locations (%s patterns)", ", ".join(SUPPRESSED_PATTERNS))
+    logger.info("=" * 70)
+    
+    # Get the directory of the input file, or use current directory if empty
+    base_dir = os.path.dirname(csv_file)
+    if not base_dir:  # If file is in current directory
+        base_dir = '.'
+    
+    cache = HoldingsCache(os.path.join(base_dir, CACHE_FILENAME))
+    output_file = os.path.join(base_dir, 'mmsids_all_items_suppressed.txt')
     
     try:
-        suppressed_mmsids = process_mms_ids_with_api(csv_file, api_key)
+        # Matches are written batch by batch so a crashed run keeps its progress
+        with open(output_file, 'w') as f:
+            suppressed_mmsids = process_mms_ids_with_api(csv_file, api_key, cache=cache, output=f)
         
-        print("=" * 70)
-        print(f"SUMMARY: Found {len(suppressed_mmsids)} titles with all holdings in suppressed locations")
-        print("\nMMS IDs to process for OCLC removal:")
+        # Rewrite the finished list in input order
+        if suppressed_mmsids:
+            with open(output_file, 'w') as f:
+                f.writelines(f"{mms_id}\n" for mms_id in suppressed_mmsids)
         
-        for mms_id in suppressed_mmsids:
-            print(mms_id)
+        logger.info("=" * 70)
+        logger.info("SUMMARY: Found %d titles with all holdings in suppressed locations", len(suppressed_mmsids))
         
-        # Save results
         if suppressed_mmsids:
-            # Get the directory of the input file, or use current directory if empty
-            base_dir = os.path.dirname(csv_file)
-            if not base_dir:  # If file is in current directory
-                base_dir = '.'
-            output_file = os.path.join(base_dir, 'mmsids_all_items_suppressed.txt')
-            with open(output_file, 'w') as f:
-                for mms_id in suppressed_mmsids:
-                    f.write(f"{mms_id}\n")
-            print(f"\nResults saved to: {output_file}")
+            logger.debug("\nMMS IDs to process for OCLC removal:\n%s", "\n".join(suppressed_mmsids))
+            logger.info("\nResults saved to: %s", output_file)
         else:
-            print("\nNo titles found with all holdings in suppressed locations.")
+            os.remove(output_file)
+            logger.info("\nNo titles found with all holdings in suppressed locations.")
     
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error("Error: %s", e)
         sys.exit(1)
+    
+    finally:
+        cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,13 +5,17 @@ Creates and populates item sets using the Alma REST API
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-import csv
 import argparse
 import sys
 import os
+import mmap
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from pathlib import Path
 import logging
 
@@ -19,6 +23,55 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Matches an ALMA_API_KEY=... line in a .env file, with or without quotes
+_ENV_API_KEY_RE = re.compile(rb'^[ \t]*ALMA_API_KEY[ \t]*=([^\r\n]*)', re.M)
+
+# Alma accepts at most 1000 members per add_members request
+MAX_ITEMS_PER_REQUEST = 1000
+# Number of add_members requests allowed in flight at once
+MAX_CONCURRENT_BATCHES = 5
+# Number of barcode lookups allowed in flight at once
+MAX_BARCODE_LOOKUPS = 8
+
+# Matches the flat number_of_members object in a set response, e.g. {"value": 12, "link": "..."}
+_MEMBER_COUNT_RE = re.compile(rb'"number_of_members"\s*:\s*(\{[^{}]*\})')
+
+# Item barcodes at this library are all-digit strings
+_BARCODE_RE = re.compile(r'^\d{8,20}$')
+
+# Fields shared by every itemized physical-item set payload
+_ITEM_SET_TEMPLATE = {
+    "type": {"value": "ITEMIZED"},
+    "content": {"value": "ITEM"},
+    "private": {"value": "false"},
+    "status": {"value": "ACTIVE"},
+    "origin": {"value": "UI"}
+}
+
+# add_members payloads also carry an empty query alongside the member list
+_ADD_MEMBERS_TEMPLATE = {
+    **_ITEM_SET_TEMPLATE,
+    "query": {"value": ""}
+}
+
+def read_member_count(content: bytes) -> Optional[Dict]:
+    """
+    Pull the number_of_members object out of a raw set response
+    
+    The add_members response echoes every member of the set, so decoding only
+    this small object avoids building thousands of member dicts.
+    
+    Args:
+        content: Raw JSON response body
+        
+    Returns:
+        The number_of_members dict, or None if it isn't present
+    """
+    match = _MEMBER_COUNT_RE.search(content)
+    if match:
+        return json.loads(match.group(1))
+    return json.loads(content).get('number_of_members')
+
 def load_api_key() -> Optional[str]:
     """
     Load API key from environment variable or .env file
@@ -40,13 +93,12 @@ def load_api_key() -> Optional[str]:
     ]
     
     for env_path in env_paths:
-        if os.path.exists(env_path):
+        if os.path.isfile(env_path) and os.path.getsize(env_path) > 0:
             try:
-                with open(env_path, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line.startswith('ALMA_API_KEY='):
-                            return line.split('=', 1)[1].strip().strip('"\'')
+                with open(env_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    match = _ENV_API_KEY_RE.search(mm)
+                    if match:
+                        return match.group(1).decode().strip().strip('"\'')
             except Exception as e:
                 logger.warning(f"Error reading {env_path}: {e}")
     
@@ -110,11 +162,62 @@ class AlmaSetClient:
         """
         self.api_key = api_key
         self.base_url = base_url
+        self._sets_url = f"{base_url}/conf/sets"
+        self._items_url = f"{base_url}/items"
         self.session = requests.Session()
         self.session.headers.update({
+            'Authorization': f'apikey {api_key}',
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
+        
+        # Keep one warm connection per concurrent worker to the single Alma host.
+        # Blocking on a full pool reuses those connections instead of opening
+        # throwaway ones that each pay a fresh TLS handshake.
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(MAX_CONCURRENT_BATCHES, MAX_BARCODE_LOOKUPS),
+            pool_block=True,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods={"GET", "POST"},
+                raise_on_status=False
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Creating a set isn't idempotent: a 5xx can arrive after Alma made the set,
+        # so only retry a create that never connected or was rate limited
+        self._create_session = requests.Session()
+        self._create_session.headers.update(self.session.headers)
+        create_adapter = HTTPAdapter(
+            max_retries=Retry(
+                total=3,
+                read=0,
+                other=0,
+                backoff_factor=0.5,
+                status_forcelist=[429],
+                allowed_methods={"POST"},
+                raise_on_status=False
+            )
+        )
+        self._create_session.mount("https://", create_adapter)
+        self._create_session.mount("http://", create_adapter)
+        
+        # Set information keyed by set ID, kept current by this client's own updates
+        self._set_info_cache: Dict[str, Dict] = {}
+    
+    def invalidate(self, set_id: str):
+        """
+        Drop cached information for a set so the next get_set_info refetches it
+        
+        Args:
+            set_id: ID of the set
+        """
+        self._set_info_cache.pop(set_id, None)
     
     def create_set(self, name: str, description: str = "", note: str = "") -> Optional[Dict]:
         """
@@ -128,48 +231,34 @@ class AlmaSetClient:
         Returns:
             Dict containing the created set information, or None if failed
         """
-        url = f"{self.base_url}/conf/sets"
+        url = self._sets_url
         params = {
             'combine': 'None',
             'set1': 'None', 
-            'set2': 'None',
-            'apikey': self.api_key
+            'set2': 'None'
         }
         
         set_data = {
+            **_ITEM_SET_TEMPLATE,
             "name": name,
             "description": description,
-            "type": {
-                "value": "ITEMIZED"
-            },
-            "content": {
-                "value": "ITEM"
-            },
-            "private": {
-                "value": "false"
-            },
-            "status": {
-                "value": "ACTIVE"
-            },
-            "note": note,
-            "origin": {
-                "value": "UI"
-            }
+            "note": note
         }
         
         try:
-            logger.info(f"Creating set: {name}")
-            response = self.session.post(url, params=params, json=set_data)
+            logger.info("Creating set: %s", name)
+            response = self._create_session.post(url, params=params, json=set_data)
             response.raise_for_status()
             
             set_info = response.json()
-            logger.info(f"Set created successfully with ID: {set_info['id']}")
+            logger.info("Set created successfully with ID: %s", set_info['id'])
+            self._set_info_cache[set_info['id']] = set_info
             return set_info
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to create set: {e}")
+            logger.error("Failed to create set: %s", e)
             if hasattr(e.response, 'text'):
-                logger.error(f"Response: {e.response.text}")
+                logger.error("Response: %s", e.response.text)
             return None
     
     def test_barcode_validity(self, barcode: str) -> bool:
@@ -185,23 +274,37 @@ class AlmaSetClient:
         """
         try:
             # Use the items API to search for the barcode
-            url = f"{self.base_url}/items"
+            url = self._items_url
             params = {
-                'item_barcode': barcode,
-                'apikey': self.api_key
+                'item_barcode': barcode
             }
             
-            response = self.session.get(url, params=params)
+            # Only the status code matters, so skip downloading the item record
+            response = self.session.head(url, params=params, allow_redirects=True)
             if response.status_code == 200:
-                logger.debug(f"Barcode {barcode} found in Alma")
+                logger.debug("Barcode %s found in Alma", barcode)
                 return True
             else:
-                logger.warning(f"Barcode {barcode} not found (status: {response.status_code})")
+                logger.warning("Barcode %s not found (status: %s)", barcode, response.status_code)
                 return False
                 
         except Exception as e:
-            logger.warning(f"Error testing barcode {barcode}: {e}")
+            logger.warning("Error testing barcode %s: %s", barcode, e)
             return False
+    
+    def validate_barcodes(self, barcodes: List[str], max_workers: int = MAX_BARCODE_LOOKUPS) -> Dict[str, bool]:
+        """
+        Check many barcodes against Alma concurrently
+        
+        Args:
+            barcodes: Barcodes to test
+            max_workers: Maximum number of lookups in flight at once
+            
+        Returns:
+            Dict mapping each barcode to True if found, False otherwise
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(barcodes, executor.map(self.test_barcode_validity, barcodes)))
 
     def add_items_to_set(self, set_id: str, item_ids: List[str], 
                         id_type: str = "BARCODE", fail_on_invalid_id: bool = False) -> bool:
@@ -217,91 +320,119 @@ class AlmaSetClient:
         Returns:
             True if successful, False otherwise
         """
-        if len(item_ids) > 1000:
-            logger.error("Cannot add more than 1000 items at once")
+        if len(item_ids) > MAX_ITEMS_PER_REQUEST:
+            logger.error("Cannot add more than %s items at once; use add_items_in_batches", MAX_ITEMS_PER_REQUEST)
             return False
         
         # First, get the current set information to include required fields
         current_set = self.get_set_info(set_id)
         if not current_set:
-            logger.error(f"Cannot retrieve set information for set {set_id}")
+            logger.error("Cannot retrieve set information for set %s", set_id)
             return False
             
-        url = f"{self.base_url}/conf/sets/{set_id}"
+        url = f"{self._sets_url}/{set_id}"
         params = {
             'id_type': id_type,
             'op': 'add_members',
-            'fail_on_invalid_id': str(fail_on_invalid_id).lower(),
-            'apikey': self.api_key
+            'fail_on_invalid_id': str(fail_on_invalid_id).lower()
         }
         
         # Full set object with members to add, including required name and description
         set_data = {
+            **_ADD_MEMBERS_TEMPLATE,
             "name": current_set["name"],
             "description": current_set["description"],
-            "type": {
-                "value": "ITEMIZED"
-            },
-            "content": {
-                "value": "ITEM"
-            },
-            "private": {
-                "value": "false"
-            },
-            "status": {
-                "value": "ACTIVE"
-            },
             "note": current_set.get("note", ""),
-            "query": {
-                "value": ""
-            },
             "members": {
                 "total_record_count": "",
                 "member": [{"id": item_id} for item_id in item_ids]
-            },
-            "origin": {
-                "value": "UI"
             }
         }
         
         try:
-            logger.info(f"Adding {len(item_ids)} items to set {set_id} using {id_type}")
-            logger.debug(f"Request URL: {url}")
-            logger.debug(f"Request params: {params}")
-            logger.debug(f"Sample items to add: {item_ids[:5]}")
+            logger.info("Adding %s items to set %s using %s", len(item_ids), set_id, id_type)
+            logger.debug("Request URL: %s", url)
+            logger.debug("Request params: %s", params)
+            logger.debug("Sample items to add: %s", item_ids[:5])
             
-            response = self.session.post(url, params=params, json=set_data)
+            # Compact separators trim ~2 bytes per member off a 1000-item body;
+            # the session already sends Content-Type: application/json
+            body = json.dumps(set_data, separators=(',', ':'))
+            response = self.session.post(url, params=params, data=body)
             
             # Log the response details regardless of status
-            logger.info(f"Response status: {response.status_code}")
-            logger.debug(f"Response headers: {dict(response.headers)}")
+            logger.info("Response status: %s", response.status_code)
+            logger.debug("Response headers: %s", response.headers)
             
             if response.status_code == 200:
-                response_data = response.json()
                 logger.info("Items added successfully")
-                logger.debug(f"Response data: {json.dumps(response_data, indent=2)}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Response data: %s", response.text)
                 
                 # Check if the response indicates how many items were actually added
-                if 'number_of_members' in response_data:
-                    member_count = response_data['number_of_members']['value']
-                    logger.info(f"Set now contains {member_count} members")
+                number_of_members = read_member_count(response.content)
+                if number_of_members is not None:
+                    if set_id in self._set_info_cache:
+                        self._set_info_cache[set_id]['number_of_members'] = number_of_members
+                    member_count = number_of_members['value']
+                    logger.info("Set now contains %s members", member_count)
                     if member_count == 0:
                         logger.warning("Set still shows 0 members - items may not have been added successfully")
                         logger.warning("This could indicate invalid barcodes or permission issues")
                 
                 return True
             else:
-                logger.error(f"HTTP Error {response.status_code}")
-                logger.error(f"Response text: {response.text}")
+                logger.error("HTTP Error %s", response.status_code)
+                logger.error("Response text: %s", response.text)
                 return False
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to add items to set: {e}")
+            logger.error("Failed to add items to set: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response text: {e.response.text}")
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response text: %s", e.response.text)
             return False
     
+    def add_items_in_batches(self, set_id: str, item_ids: List[str],
+                             id_type: str = "BARCODE", fail_on_invalid_id: bool = False,
+                             max_concurrency: int = MAX_CONCURRENT_BATCHES) -> bool:
+        """
+        Add any number of items to a set, splitting them into 1000-item requests
+        that run concurrently
+        
+        Args:
+            set_id: ID of the set to populate
+            item_ids: List of item IDs to add to the set
+            id_type: Type of ID being used (BARCODE, MMS_ID, etc.)
+            fail_on_invalid_id: Whether to fail if an invalid ID is encountered
+            max_concurrency: Maximum number of batches in flight at once
+            
+        Returns:
+            True if every batch succeeded, False otherwise
+        """
+        batches = [item_ids[i:i + MAX_ITEMS_PER_REQUEST]
+                   for i in range(0, len(item_ids), MAX_ITEMS_PER_REQUEST)]
+        
+        if len(batches) == 1:
+            return self.add_items_to_set(set_id, batches[0], id_type, fail_on_invalid_id)
+        
+        logger.info("Adding %s items to set %s in %s batches", len(item_ids), set_id, len(batches))
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = list(executor.map(
+                lambda batch: self.add_items_to_set(set_id, batch, id_type, fail_on_invalid_id),
+                batches
+            ))
+        
+        # Batches finish out of order, so the cached member count may be stale
+        self.invalidate(set_id)
+        
+        failed = results.count(False)
+        if failed:
+            logger.warning("%s of %s batches failed to add items to set %s", failed, len(batches), set_id)
+        
+        return failed == 0
+    
     def create_and_populate_set(self, name: str, item_ids: List[str], 
                                description: str = "", note: str = "", 
                                id_type: str = "BARCODE") -> Optional[str]:
@@ -310,7 +441,7 @@ class AlmaSetClient:
         
         Args:
             name: Name of the set
-            item_ids: List of item IDs to add to the set (up to 1000 items)
+            item_ids: List of item IDs to add to the set (sent in 1000-item batches)
             description: Description of the set
             note: Optional note for the set
             id_type: Type of ID being used (BARCODE, MMS_ID, etc.)
@@ -327,58 +458,87 @@ class AlmaSetClient:
         
         # Add items to the set
         if item_ids:
-            success = self.add_items_to_set(set_id, item_ids, id_type)
+            success = self.add_items_in_batches(set_id, item_ids, id_type)
             if not success:
-                logger.warning(f"Set {set_id} created but failed to add items")
+                logger.warning("Set %s created but failed to add items", set_id)
         else:
             logger.info("No items provided to add to the set")
         
         return set_id
     
-    def get_set_info(self, set_id: str) -> Optional[Dict]:
+    def get_set_info(self, set_id: str, force: bool = False) -> Optional[Dict]:
         """
         Get information about an existing set
         
+        Results are cached per set; changes made through this client keep the
+        cache current, and invalidate() or force=True forces a refetch.
+        
         Args:
             set_id: ID of the set
+            force: Fetch fresh data from Alma even if the set is cached
             
         Returns:
             Dict containing set information, or None if failed
         """
-        url = f"{self.base_url}/conf/sets/{set_id}"
-        params = {'apikey': self.api_key}
+        if set_id in self._set_info_cache and not force:
+            return self._set_info_cache[set_id]
+        
+        url = f"{self._sets_url}/{set_id}"
         
         try:
-            response = self.session.get(url, params=params)
+            response = self.session.get(url)
             response.raise_for_status()
-            return response.json()
+            set_info = response.json()
+            self._set_info_cache[set_id] = set_info
+            return set_info
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get set info: {e}")
+            logger.error("Failed to get set info: %s", e)
             return None
 
-def read_barcodes_from_csv(csv_file: str) -> List[str]:
+def iter_barcodes(csv_file: str, validate: bool = True) -> Iterator[str]:
     """
-    Read barcodes from a tab-delimited CSV file
+    Stream barcodes from a tab-delimited CSV file one line at a time
     
     Args:
         csv_file: Path to the tab-delimited CSV file containing barcodes in first column
+        validate: Drop values that don't look like item barcodes (set False for other ID types)
+        
+    Yields:
+        Non-empty barcodes from the first column
+    """
+    # A 1 MiB read buffer keeps large weeding dumps to a handful of read() calls
+    with open(csv_file, 'r', encoding='utf-8', newline='', buffering=1024 * 1024) as file:
+        for line in file:
+            tab = line.find('\t')
+            # Spreadsheet exports may wrap the barcode in quotes
+            barcode = (line[:tab] if tab >= 0 else line).strip().strip('"')
+            if not barcode:
+                continue
+            if validate and not _BARCODE_RE.match(barcode):
+                # Catch bad rows here rather than spending an API round-trip on them
+                logger.warning("Rejecting malformed barcode: %s", barcode)
+                continue
+            yield barcode
+
+def read_barcodes_from_csv(csv_file: str, validate: bool = True) -> List[str]:
+    """
+    Read unique barcodes from a tab-delimited CSV file
+    
+    Duplicate barcodes are dropped (keeping the first occurrence) so they
+    don't take up slots in a 1000-item batch.
+    
+    Args:
+        csv_file: Path to the tab-delimited CSV file containing barcodes in first column
+        validate: Drop values that don't look like item barcodes (set False for other ID types)
         
     Returns:
-        List of barcodes as strings
+        List of barcodes as strings, in file order
     """
-    barcodes = []
     try:
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file, delimiter='\t')
-            
-            for row in reader:
-                if row and row[0].strip():  # Skip empty rows and rows with empty first column
-                    barcode = str(row[0]).strip()
-                    if barcode:
-                        barcodes.append(barcode)
+        barcodes = list(dict.fromkeys(iter_barcodes(csv_file, validate)))
         
-        logger.info(f"Read {len(barcodes)} barcodes from {csv_file}")
+        logger.info(f"Read {len(barcodes)} unique barcodes from {csv_file}")
         if barcodes:
             logger.info(f"Sample barcodes: {barcodes[:3]}...")
         return barcodes
@@ -465,39 +625,22 @@ Environment Setup:
     )
     
     return parser.parse_args()
-    """
-    Convenience function to create a weeded items set with today's date
-    
-    Args:
-        api_key: Your Alma API key
-        item_ids: List of item IDs to add to the set (up to 1000 items)
-        id_type: Type of ID being used (BARCODE, MMS_ID, etc.)
-        
-    Returns:
-        Set ID if successful, None otherwise
-    """
-    client = AlmaSetClient(api_key)
-    
-    # Generate set name with current date
-    today = datetime.now().strftime("%Y%m%d")
-    set_name = f"Weeded-{today}"
-    description = "Oakland Weeded Items"
-    
-    return client.create_and_populate_set(set_name, item_ids, description, id_type=id_type)
 
-def create_weeded_set(api_key: str, item_ids: List[str], id_type: str = "BARCODE") -> Optional[str]:
+def create_weeded_set(api_key: str, item_ids: List[str], id_type: str = "BARCODE",
+                      client: Optional[AlmaSetClient] = None) -> Optional[str]:
     """
     Convenience function to create a weeded items set with today's date
     
     Args:
         api_key: Your Alma API key
-        item_ids: List of item IDs to add to the set (up to 1000 items)
+        item_ids: List of item IDs to add to the set (sent in 1000-item batches)
         id_type: Type of ID being used (BARCODE, MMS_ID, etc.)
+        client: Existing client to reuse (and share its connection pool)
         
     Returns:
         Set ID if successful, None otherwise
     """
-    client = AlmaSetClient(api_key)
+    client = client or AlmaSetClient(api_key)
     
     # Generate set name with current date
     today = datetime.now().strftime("%Y%m%d")
@@ -525,16 +668,13 @@ def main():
     # Read barcodes from CSV if provided
     item_ids = []
     if args.csv_file:
-        item_ids = read_barcodes_from_csv(args.csv_file)
+        item_ids = read_barcodes_from_csv(args.csv_file, validate=args.id_type == 'BARCODE')
         if not item_ids:
             print(f"Error: No valid IDs found in {args.csv_file}")
             sys.exit(1)
         
-        # Check batch limit
-        if len(item_ids) > 1000:
-            print(f"Warning: CSV contains {len(item_ids)} items, but Alma limits to 1000 per batch.")
-            print("Only the first 1000 items will be processed.")
-            item_ids = item_ids[:1000]
+        if len(item_ids) > MAX_ITEMS_PER_REQUEST:
+            print(f"CSV contains {len(item_ids)} items; they will be added in batches of {MAX_ITEMS_PER_REQUEST}.")
     
     # Create client
     client = AlmaSetClient(api_key)
@@ -591,24 +731,40 @@ def main():
                         else:
                             print(f"  ⚠️  Even known working barcodes failed to be added")
                     
-                    print(f"\nNow trying individual items from your file...")
-                    success_count = 0
-                    for i, item_id in enumerate(item_ids[:5]):  # Test first 5
-                        success = client.add_items_to_set(set_id, [item_id], args.id_type, args.fail_on_invalid)
-                        if success:
-                            # Check if it actually got added
-                            updated_info = client.get_set_info(set_id)
-                            current_count = updated_info['number_of_members']['value'] if updated_info else 0
-                            if current_count > success_count:
-                                success_count = current_count
-                                print(f"  ✅ {item_id}: Added successfully (set now has {current_count} members)")
+                    if args.id_type == 'BARCODE':
+                        print("\nChecking which barcodes from your file exist in Alma...")
+                        # One HEAD request per barcode, so only sample the first 5
+                        sample = item_ids[:5]
+                        validity = client.validate_barcodes(sample)
+                        missing = [barcode for barcode, found in validity.items() if not found]
+                        print(f"  {len(sample) - len(missing)} of {len(sample)} barcodes found in Alma")
+                        for barcode in missing:
+                            print(f"  ❌ {barcode}: Not found")
+                        if len(item_ids) > 5:
+                            print(f"  ... (checked first 5 of {len(item_ids)} barcodes)")
+                    else:
+                        print("\nNow trying individual items from your file...")
+                        # Add the first 5 items concurrently, one request per item
+                        with ThreadPoolExecutor(max_workers=5) as executor:
+                            results = list(executor.map(
+                                lambda item_id: (item_id, client.add_items_to_set(
+                                    set_id, [item_id], args.id_type, args.fail_on_invalid)),
+                                item_ids[:5]
+                            ))
+                        
+                        for item_id, success in results:
+                            if success:
+                                print(f"  ✅ {item_id}: API accepted the item")
                             else:
-                                print(f"  ⚠️  {item_id}: API returned success but item not in set")
-                        else:
-                            print(f"  ❌ {item_id}: Failed to add")
-                    
-                    if len(item_ids) > 5:
-                        print(f"  ... (showing first 5 of {len(item_ids)} items)")
+                                print(f"  ❌ {item_id}: Failed to add")
+                        
+                        # Requests finished in any order, so check the final count once
+                        updated_info = client.get_set_info(set_id, force=True)
+                        if updated_info:
+                            print(f"  Set now has {updated_info['number_of_members']['value']} members")
+                        
+                        if len(item_ids) > 5:
+                            print(f"  ... (showing first 5 of {len(item_ids)} items)")
                 
                 print(f"\nPossible causes:")
                 print(f"- Items may be electronic/digital (only physical items can be added to item sets)")
@@ -643,7 +799,7 @@ def example_usage():
     
     # Example 1: Create a weeded items set
     print("Creating weeded items set...")
-    set_id = create_weeded_set(API_KEY, ITEM_IDS)
+    set_id = create_weeded_set(API_KEY, ITEM_IDS, client=client)
     if set_id:
         print(f"Successfully created set with ID: {set_id}")
     else:
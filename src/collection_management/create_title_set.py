@@ -5,12 +5,16 @@ Creates and populates title sets using MMSIDs via the Alma REST API
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import argparse
 import sys
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from pathlib import Path
 import logging
 
@@ -18,6 +22,21 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Matches an ALMA_API_KEY=... line in a .env file, with or without quotes
+_ENV_API_KEY_RE = re.compile(r'^[ \t]*ALMA_API_KEY[ \t]*=([^\r\n]*)', re.M)
+# .env files are tiny; never scan more than this much of one
+_ENV_READ_LIMIT = 64 * 1024
+
+# Alma MMSIDs are all digits, 14-19 long
+_MMSID_RE = re.compile(r'^\d{14,19}$')
+
+# Alma accepts at most 1000 members per add_members request
+MAX_TITLES_PER_REQUEST = 1000
+# Number of add_members requests allowed in flight at once
+MAX_CONCURRENT_BATCHES = 5
+# Number of MMSID lookups allowed in flight at once
+MAX_MMSID_LOOKUPS = 16
+
 def load_api_key() -> Optional[str]:
     """
     Load API key from environment variable or .env file
@@ -39,15 +58,14 @@ def load_api_key() -> Optional[str]:
     ]
     
     for env_path in env_paths:
-        if os.path.exists(env_path):
+        if os.path.isfile(env_path):
             try:
                 with open(env_path, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line.startswith('ALMA_API_KEY='):
-                            return line.split('=', 1)[1].strip().strip('"\'')
+                    match = _ENV_API_KEY_RE.search(f.read(_ENV_READ_LIMIT))
+                if match:
+                    return match.group(1).strip().strip('"\'')
             except Exception as e:
-                logger.warning(f"Error reading {env_path}: {e}")
+                logger.warning("Error reading %s: %s", env_path, e)
     
     return None
 
@@ -90,9 +108,9 @@ def setup_logging(csv_file: Optional[str] = None, verbose: bool = False):
             file_handler.setFormatter(formatter)
             root_logger.addHandler(file_handler)
             
-            logger.info(f"Logging to file: {log_file_path}")
+            logger.info("Logging to file: %s", log_file_path)
         except Exception as e:
-            logger.warning(f"Could not set up file logging: {e}")
+            logger.warning("Could not set up file logging: %s", e)
     
     return root_logger
 
@@ -111,9 +129,46 @@ class AlmaTitleSetClient:
         self.base_url = base_url
         self.session = requests.Session()
         self.session.headers.update({
+            'Authorization': f'apikey {api_key}',
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
+        
+        # Pool enough connections to the Alma host for concurrent lookups, and
+        # retry transient failures in urllib3 so the same request body is resent as-is
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=frozenset(["GET", "POST"]),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Creating a set isn't idempotent: a 5xx can arrive after Alma made the set,
+        # so only retry a create that never connected or was rate limited
+        self._create_session = requests.Session()
+        self._create_session.headers.update(self.session.headers)
+        create_adapter = HTTPAdapter(
+            max_retries=Retry(
+                total=5,
+                read=0,
+                other=0,
+                backoff_factor=0.3,
+                status_forcelist=[429],
+                allowed_methods=frozenset(["POST"]),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        self._create_session.mount("https://", create_adapter)
+        self._create_session.mount("http://", create_adapter)
     
     def create_set(self, name: str, description: str = "", note: str = "") -> Optional[Dict]:
         """
@@ -131,8 +186,7 @@ class AlmaTitleSetClient:
         params = {
             'combine': 'None',
             'set1': 'None', 
-            'set2': 'None',
-            'apikey': self.api_key
+            'set2': 'None'
         }
         
         set_data = {
@@ -157,21 +211,21 @@ class AlmaTitleSetClient:
         }
         
         try:
-            logger.info(f"Creating title set: {name}")
-            response = self.session.post(url, params=params, json=set_data)
+            logger.info("Creating title set: %s", name)
+            response = self._create_session.post(url, params=params, json=set_data)
             response.raise_for_status()
             
             set_info = response.json()
-            logger.info(f"Title set created successfully with ID: {set_info['id']}")
+            logger.info("Title set created successfully with ID: %s", set_info['id'])
             return set_info
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to create title set: {e}")
+            logger.error("Failed to create title set: %s", e)
             if hasattr(e.response, 'text'):
-                logger.error(f"Response: {e.response.text}")
+                logger.error("Response: %s", e.response.text)
             return None
     
-    def test_mmsid_validity(self, mmsid: str) -> bool:
+    def test_mmsid_validity(self, mmsid: str) -> Optional[bool]:
         """
         Test if a single MMSID can be found in Alma
         This is a diagnostic function to help troubleshoot MMSID issues
@@ -180,24 +234,45 @@ class AlmaTitleSetClient:
             mmsid: Single MMSID to test
             
         Returns:
-            True if MMSID is found, False otherwise
+            True if MMSID is found, False if Alma says it doesn't exist,
+            None if the lookup failed (auth, rate limit, server or network error)
         """
+        if not _MMSID_RE.match(mmsid):
+            logger.warning("MMSID %s is malformed", mmsid)
+            return False
+        
         try:
             # Use the bibs API to search for the MMSID
             url = f"{self.base_url}/bibs/{mmsid}"
-            params = {'apikey': self.api_key}
             
-            response = self.session.get(url, params=params)
+            response = self.session.get(url)
             if response.status_code == 200:
-                logger.debug(f"MMSID {mmsid} found in Alma")
+                logger.debug("MMSID %s found in Alma", mmsid)
                 return True
-            else:
-                logger.warning(f"MMSID {mmsid} not found (status: {response.status_code})")
+            elif response.status_code in (400, 404):
+                logger.warning("MMSID %s not found (status: %s)", mmsid, response.status_code)
                 return False
+            else:
+                logger.warning("Could not check MMSID %s (status: %s)", mmsid, response.status_code)
+                return None
                 
         except Exception as e:
-            logger.warning(f"Error testing MMSID {mmsid}: {e}")
-            return False
+            logger.warning("Error testing MMSID %s: %s", mmsid, e)
+            return None
+    
+    def test_mmsids_bulk(self, mmsids: List[str], max_workers: int = MAX_MMSID_LOOKUPS) -> Dict[str, Optional[bool]]:
+        """
+        Check many MMSIDs against Alma concurrently
+        
+        Args:
+            mmsids: MMSIDs to test
+            max_workers: Maximum number of lookups in flight at once
+            
+        Returns:
+            Dict mapping each MMSID to the result of test_mmsid_validity
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(mmsids, executor.map(self.test_mmsid_validity, mmsids)))
 
     def add_titles_to_set(self, set_id: str, mmsids: List[str], 
                          fail_on_invalid_id: bool = True) -> bool:
@@ -212,16 +287,15 @@ class AlmaTitleSetClient:
         Returns:
             True if successful, False otherwise
         """
-        if len(mmsids) > 1000:
-            logger.error("Cannot add more than 1000 titles at once")
+        if len(mmsids) > MAX_TITLES_PER_REQUEST:
+            logger.error("Cannot add more than %s titles at once; use add_titles_in_batches", MAX_TITLES_PER_REQUEST)
             return False
             
         url = f"{self.base_url}/conf/sets/{set_id}"
         params = {
             'id_type': 'SYSTEM_NUMBER',  # Always MMS_ID for bibliographic records
             'op': 'add_members',
-            'fail_on_invalid_id': str(fail_on_invalid_id).lower(),
-            'apikey': self.api_key
+            'fail_on_invalid_id': str(fail_on_invalid_id).lower()
         }
         
         # Set object for bibliographic records (IEP content type)
@@ -250,45 +324,86 @@ class AlmaTitleSetClient:
                 "value": "UI"
             }
         }
+        # Serialize once; any retry reuses this buffer. Compact separators trim
+        # ~2 bytes per member, and the session already sends Content-Type: application/json
+        body = json.dumps(set_data, separators=(',', ':'))
         
         try:
-            logger.info(f"Adding {len(mmsids)} titles to set {set_id}")
-            logger.debug(f"Request URL: {url}")
-            logger.debug(f"Request params: {params}")
-            logger.debug(f"Sample MMSIDs to add: {mmsids[:5]}")
+            logger.info("Adding %s titles to set %s", len(mmsids), set_id)
+            logger.debug("Request URL: %s", url)
+            logger.debug("Request params: %s", params)
+            logger.debug("Sample MMSIDs to add: %s", mmsids[:5])
             
-            response = self.session.post(url, params=params, json=set_data)
+            response = self.session.post(url, params=params, data=body)
             
             # Log the response details regardless of status
-            logger.info(f"Response status: {response.status_code}")
-            logger.debug(f"Response headers: {dict(response.headers)}")
+            logger.info("Response status: %s", response.status_code)
+            logger.debug("Response headers: %s", response.headers)
             
             if response.status_code == 200:
                 response_data = response.json()
                 logger.info("Titles added successfully")
-                logger.debug(f"Response data: {json.dumps(response_data, indent=2)}")
+                # Pretty-printing a large set response is costly; only do it when it will be shown
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Response data: %s", json.dumps(response_data, indent=2))
                 
                 # Check if the response indicates how many titles were actually added
                 if 'number_of_members' in response_data:
                     member_count = response_data['number_of_members']['value']
-                    logger.info(f"Set now contains {member_count} members")
+                    logger.info("Set now contains %s members", member_count)
                     if member_count == 0:
                         logger.warning("Set still shows 0 members - titles may not have been added successfully")
                         logger.warning("This could indicate invalid MMSIDs or permission issues")
                 
                 return True
             else:
-                logger.error(f"HTTP Error {response.status_code}")
-                logger.error(f"Response text: {response.text}")
+                logger.error("HTTP Error %s", response.status_code)
+                logger.error("Response text: %s", response.text)
                 return False
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to add titles to set: {e}")
+            logger.error("Failed to add titles to set: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response text: {e.response.text}")
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response text: %s", e.response.text)
             return False
     
+    def add_titles_in_batches(self, set_id: str, mmsids: List[str],
+                              fail_on_invalid_id: bool = True,
+                              max_concurrency: int = MAX_CONCURRENT_BATCHES) -> bool:
+        """
+        Add any number of titles to a set, splitting them into 1000-title requests
+        that run concurrently
+        
+        Args:
+            set_id: ID of the set to populate
+            mmsids: List of MMSIDs to add to the set
+            fail_on_invalid_id: Whether to fail if an invalid ID is encountered
+            max_concurrency: Maximum number of batches in flight at once
+            
+        Returns:
+            True if every batch succeeded, False otherwise
+        """
+        batches = [mmsids[i:i + MAX_TITLES_PER_REQUEST]
+                   for i in range(0, len(mmsids), MAX_TITLES_PER_REQUEST)]
+        
+        if len(batches) == 1:
+            return self.add_titles_to_set(set_id, batches[0], fail_on_invalid_id)
+        
+        logger.info("Adding %s titles to set %s in %s batches", len(mmsids), set_id, len(batches))
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = list(executor.map(
+                lambda batch: self.add_titles_to_set(set_id, batch, fail_on_invalid_id),
+                batches
+            ))
+        
+        failed = results.count(False)
+        if failed:
+            logger.warning("%s of %s batches failed to add titles to set %s", failed, len(batches), set_id)
+        
+        return failed == 0
+    
     def create_and_populate_set(self, name: str, mmsids: List[str], 
                                description: str = "", note: str = "") -> Optional[str]:
         """
@@ -296,7 +411,7 @@ class AlmaTitleSetClient:
         
         Args:
             name: Name of the set
-            mmsids: List of MMSIDs to add to the set (up to 1000 items)
+            mmsids: List of MMSIDs to add to the set (sent in 1000-title batches)
             description: Description of the set
             note: Optional note for the set
             
@@ -312,9 +427,9 @@ class AlmaTitleSetClient:
         
         # Add titles to the set
         if mmsids:
-            success = self.add_titles_to_set(set_id, mmsids)
+            success = self.add_titles_in_batches(set_id, mmsids)
             if not success:
-                logger.warning(f"Set {set_id} created but failed to add titles")
+                logger.warning("Set %s created but failed to add titles", set_id)
         else:
             logger.info("No MMSIDs provided to add to the set")
         
@@ -331,17 +446,38 @@ class AlmaTitleSetClient:
             Dict containing set information, or None if failed
         """
         url = f"{self.base_url}/conf/sets/{set_id}"
-        params = {'apikey': self.api_key}
         
         try:
-            response = self.session.get(url, params=params)
+            response = self.session.get(url)
             response.raise_for_status()
             return response.json()
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get set info: {e}")
+            logger.error("Failed to get set info: %s", e)
             return None
 
+def iter_mmsids(csv_file: str) -> Iterator[str]:
+    """
+    Stream MMSIDs from a simple text file one line at a time
+    
+    Args:
+        csv_file: Path to the file containing MMSIDs (one MMSID per line)
+        
+    Yields:
+        MMSIDs, skipping empty lines, # comments and malformed values
+    """
+    # A 1 MiB read buffer keeps large exports to a handful of read() calls
+    with open(csv_file, 'r', encoding='utf-8', buffering=1024 * 1024) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+            if not _MMSID_RE.match(line):
+                # Catch bad rows here rather than spending an API round-trip on them
+                logger.warning("Rejecting malformed MMSID: %s", line)
+                continue
+            yield line
+
 def read_mmsids_from_csv(csv_file: str) -> List[str]:
     """
     Read MMSIDs from a simple text file (one MMSID per line)
@@ -352,24 +488,19 @@ def read_mmsids_from_csv(csv_file: str) -> List[str]:
     Returns:
         List of MMSIDs as strings
     """
-    mmsids = []
     try:
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            for line_num, line in enumerate(file, 1):
-                line = line.strip()
-                if line and not line.startswith('#'):  # Skip empty lines and comments
-                    mmsids.append(line)
+        mmsids = list(iter_mmsids(csv_file))
         
-        logger.info(f"Read {len(mmsids)} MMSIDs from {csv_file}")
+        logger.info("Read %s MMSIDs from %s", len(mmsids), csv_file)
         if mmsids:
-            logger.info(f"Sample MMSIDs: {mmsids[:3]}...")
+            logger.info("Sample MMSIDs: %s...", mmsids[:3])
         return mmsids
         
     except FileNotFoundError:
-        logger.error(f"File not found: {csv_file}")
+        logger.error("File not found: %s", csv_file)
         return []
     except Exception as e:
-        logger.error(f"Error reading file: {e}")
+        logger.error("Error reading file: %s", e)
         return []
 
 def parse_arguments():
@@ -444,7 +575,7 @@ def create_title_set(api_key: str, mmsids: List[str]) -> Optional[str]:
     
     Args:
         api_key: Your Alma API key
-        mmsids: List of MMSIDs to add to the set (up to 1000 items)
+        mmsids: List of MMSIDs to add to the set (sent in 1000-title batches)
         
     Returns:
         Set ID if successful, None otherwise
@@ -482,15 +613,40 @@ def main():
             print(f"Error: No valid MMSIDs found in {args.csv_file}")
             sys.exit(1)
         
-        # Check batch limit
-        if len(mmsids) > 1000:
-            print(f"Warning: CSV contains {len(mmsids)} MMSIDs, but Alma limits to 1000 per batch.")
-            print("Only the first 1000 MMSIDs will be processed.")
-            mmsids = mmsids[:1000]
+        if len(mmsids) > MAX_TITLES_PER_REQUEST:
+            print(f"CSV contains {len(mmsids)} MMSIDs; they will be added in batches of {MAX_TITLES_PER_REQUEST}.")
     
     # Create client
     client = AlmaTitleSetClient(api_key)
     
+    # Check every MMSID up front in parallel before the set is created
+    if mmsids and (args.verbose or args.fail_on_invalid):
+        print(f"Checking {len(mmsids)} MMSIDs in Alma...")
+        validity = client.test_mmsids_bulk(mmsids)
+        unchecked = [mmsid for mmsid, found in validity.items() if found is None]
+        if unchecked:
+            # Lookup errors say nothing about the MMSID, so keep it in the set
+            print(f"  ⚠️  {len(unchecked)} MMSIDs could not be checked and will be kept:")
+            for mmsid in unchecked[:5]:
+                print(f"     {mmsid}")
+            if len(unchecked) > 5:
+                print(f"     ... (showing first 5 of {len(unchecked)} unchecked MMSIDs)")
+        invalid = [mmsid for mmsid, found in validity.items() if found is False]
+        if invalid:
+            print(f"  ❌ {len(invalid)} MMSIDs not found in Alma:")
+            for mmsid in invalid[:5]:
+                print(f"     {mmsid}")
+            if len(invalid) > 5:
+                print(f"     ... (showing first 5 of {len(invalid)} invalid MMSIDs)")
+            if args.fail_on_invalid:
+                print("Error: Invalid MMSIDs found and --fail-on-invalid is set; no set was created")
+                sys.exit(1)
+            print("  These MMSIDs will be skipped")
+            mmsids = [mmsid for mmsid, found in validity.items() if found is not False]
+            if not mmsids:
+                print("Error: None of the MMSIDs were found in Alma")
+                sys.exit(1)
+    
     # Determine set name
     if args.name:
         set_name = args.name
@@ -529,27 +685,8 @@ def main():
             if member_count == 0 and mmsids:
                 print(f"\n⚠️  Warning: Set was created but contains 0 members")
                 print(f"This suggests the MMSIDs may not be valid or accessible")
-                
-                # Try adding MMSIDs one by one to identify the problematic ones
-                if args.verbose:
-                    print(f"\nTrying to add MMSIDs individually to identify issues...")
-                    success_count = 0
-                    for i, mmsid in enumerate(mmsids[:5]):  # Test first 5
-                        success = client.add_titles_to_set(set_id, [mmsid], args.fail_on_invalid)
-                        if success:
-                            # Check if it actually got added
-                            updated_info = client.get_set_info(set_id)
-                            current_count = updated_info['number_of_members']['value'] if updated_info else 0
-                            if current_count > success_count:
-                                success_count = current_count
-                                print(f"  ✅ {mmsid}: Added successfully (set now has {current_count} members)")
-                            else:
-                                print(f"  ⚠️  {mmsid}: API returned success but MMSID not in set")
-                        else:
-                            print(f"  ❌ {mmsid}: Failed to add")
-                    
-                    if len(mmsids) > 5:
-                        print(f"  ... (showing first 5 of {len(mmsids)} MMSIDs)")
+                if not args.verbose:
+                    print("Re-run with --verbose to check each MMSID in Alma before creating the set")
                 
                 print(f"\nPossible causes:")
                 print(f"- MMSIDs don't exist in your Alma instance")
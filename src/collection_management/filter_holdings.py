@@ -1,7 +1,39 @@
 import pandas as pd
+import csv
 import re
 import sys
 import os
+from itertools import batched
+from openpyxl import load_workbook
+
+# A holding line in the Physical Availability column starts with
+# "Physical version at [LOCATION];", one per line
+LOCATION_PATTERN = re.compile(r'^\s*Physical version at [a-zA-Z0-9]+;', re.M)
+SUPPRESSED_LOCATION_PATTERN = re.compile(r'^\s*Physical version at olwdfy[a-zA-Z0-9]*;', re.M)
+
+# Rows handed to pandas at a time, keeping vectorized matching without loading the whole sheet
+ROWS_PER_CHUNK = 10000
+
+def iter_holdings_rows(excel_file_path):
+    """
+    Stream (MMS ID, Physical Availability) pairs from the first sheet of an Alma export.
+    
+    Args:
+        excel_file_path (str): Path to the Excel file
+        
+    Yields:
+        tuple: (MMS ID, Physical Availability) for each data row
+    """
+    wb = load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows)
+        mms_idx = header.index('MMS ID')
+        pa_idx = header.index('Physical Availability')
+        for row in rows:
+            yield row[mms_idx], row[pa_idx]
+    finally:
+        wb.close()
 
 def parse_alma_holdings(excel_file_path):
     """
@@ -15,35 +47,31 @@ def parse_alma_holdings(excel_file_path):
         list: List of MMSIDs where all holdings are in suppressed locations
     """
     
-    # Read the Excel file
-    df = pd.read_excel(excel_file_path)
-    
-    # List to store MMSIDs that meet our criteria
     suppressed_only_mmsids = []
     
-    for index, row in df.iterrows():
-        mms_id = row['MMS ID']
-        physical_availability = row['Physical Availability']
+    # Read the sheet in chunks so only two columns of ROWS_PER_CHUNK rows are in memory at once
+    for chunk in batched(iter_holdings_rows(excel_file_path), ROWS_PER_CHUNK):
+        mms_ids, texts = zip(*chunk)
+        mms_ids = pd.Series(mms_ids)
+        physical_availability = pd.Series(texts).fillna('').astype(str)
         
-        # Skip if no physical availability data
-        if pd.isna(physical_availability):
-            continue
-            
-        # Parse the physical availability string to extract locations
-        locations = extract_locations(physical_availability)
+        # Count every holding line in a single vectorized pass, then count the
+        # suppressed ones only for titles that have a physical location at all
+        location_counts = physical_availability.str.count(LOCATION_PATTERN)
+        has_locations = location_counts > 0
+        suppressed_counts = physical_availability[has_locations].str.count(SUPPRESSED_LOCATION_PATTERN)
         
-        if not locations:
-            continue
-            
-        # Check if ALL locations match the suppressed pattern (olwdfy)
-        all_suppressed = all(location.startswith('olwdfy') for location in locations)
+        # Titles with at least one location, all of which match the suppressed pattern (olwdfy)
+        mask = has_locations & (suppressed_counts == location_counts[has_locations]).reindex(
+            location_counts.index, fill_value=False)
         
-        if all_suppressed:
-            suppressed_only_mmsids.append(mms_id)
+        for mms_id, text in zip(mms_ids[mask], physical_availability[mask]):
             print(f"Found suppressed-only title: {mms_id}")
-            print(f"  Locations: {locations}")
-            print(f"  Physical Availability: {physical_availability[:100]}...")
+            print(f"  Locations: {extract_locations(text)}")
+            print(f"  Physical Availability: {text[:100]}...")
             print()
+        
+        suppressed_only_mmsids.extend(mms_ids[mask].tolist())
     
     return suppressed_only_mmsids
 
@@ -111,10 +139,10 @@ def main():
         if suppressed_mmsids:
             base_name = os.path.splitext(os.path.basename(excel_file))[0]
             output_file = f'{base_name}_suppressed_only_mmsids.csv'
-            with open(output_file, 'w') as f:
-                f.write(f"MMS ID\n")
-                for mms_id in suppressed_mmsids:
-                    f.write(f"{mms_id}\n")
+            with open(output_file, 'w', newline='', buffering=1 << 20) as f:
+                writer = csv.writer(f)
+                writer.writerow(['MMS ID'])
+                writer.writerows([mms_id] for mms_id in suppressed_mmsids)
             print(f"\nResults also saved to: {output_file}")
         else:
             print("\nNo titles found with all holdings in suppressed locations.")
@@ -1,38 +1,77 @@
 from bookops_worldcat import WorldcatAccessToken, MetadataSession
-from time import sleep
+from dotenv import load_dotenv
+from time import sleep, monotonic
+import os
+import threading
 
-def getToken():
+load_dotenv()
+
+# OCLC allows 50 requests/second per key; also cap how many are in flight at once
+MAX_REQUESTS_PER_SECOND = 50
+MAX_CONCURRENT_REQUESTS = 8
+
+_RATE = threading.Semaphore(MAX_CONCURRENT_REQUESTS)
+_rate_lock = threading.Lock()
+_next_request_at = 0.0
+
+# Brief bibs already fetched in this process, keyed by OCLC number
+_briefBibCache = {}
 
-    token = WorldcatAccessToken(
-        key="ah7cfWMHiiFQA2KL5DhmgQzJiUcPFxauH9x04JYcqqgrNeOBplFhN73zbF2BAYKYobEs5J0KqY6iiMzf",
-        secret="B6Y/rarweIqSpyrIK+THTWUSZ5pJLpgY",
-        scopes="WorldCatMetadataAPI",
-    )
-    return token
+def waitForRateLimit():
+    # Reserve the next slot on a shared schedule so threads stay under the per-second cap
+    global _next_request_at
+    with _rate_lock:
+        now = monotonic()
+        wait = _next_request_at - now
+        _next_request_at = max(now, _next_request_at) + 1 / MAX_REQUESTS_PER_SECOND
+    if wait > 0:
+        sleep(wait)
+
+# Token and session shared by every caller in this process
+_TOKEN = None
+_SESSION = None
+
+def getToken():
+    # Reuse the current token until it expires rather than doing an OAuth round-trip per call
+    global _TOKEN
+    if _TOKEN is None or _TOKEN.is_expired():
+        _TOKEN = WorldcatAccessToken(
+            key=os.environ['WORLDCAT_API_KEY'],
+            secret=os.environ['WORLDCAT_API_SECRET'],
+            scopes="WorldCatMetadataAPI",
+        )
+    return _TOKEN
 
 def getSession(token):
-    # Create a SearchSession object
-    session = MetadataSession(authorization=token)
-    return session
+    # Create a MetadataSession object, reusing the last one if it holds the same token
+    global _SESSION
+    if _SESSION is None or _SESSION.authorization is not token:
+        _SESSION = MetadataSession(authorization=token)
+    return _SESSION
 
 def getBriefBib(oclc_number, session):
-    sleep(0.5)
-    with session:
+    # Multi-volume sets and re-runs repeat OCLC numbers; skip the network (and the rate limit) for those
+    if oclc_number in _briefBibCache:
+        return _briefBibCache[oclc_number]
+    # The caller enters the session once for the whole run
+    with _RATE:
+        waitForRateLimit()
         response = session.brief_bibs_get(oclc_number)
         briefBib = response.json()
+    _briefBibCache[oclc_number] = briefBib
     return briefBib
 
 def holdingsUnset(oclc_number, session):
+    # The caller enters the session once for the whole run
     sleep(0.5)
-    with session:
-        response = session.holdings_unset(oclcNumber=oclc_number)
-        success = response.json()['success']
-        if success:
-            print(f"{oclc_number}: {response.json()['message']}")
-            return response.json()
-        else:
-            print(f"ERROR UNSETTING HOLDING FOR {oclc_number}")
-            return None
+    response = session.holdings_unset(oclcNumber=oclc_number)
+    success = response.json()['success']
+    if success:
+        print(f"{oclc_number}: {response.json()['message']}")
+        return response.json()
+    else:
+        print(f"ERROR UNSETTING HOLDING FOR {oclc_number}")
+        return None
 
 if __name__ == "__main__":
     oclc_number = '1110469890'
@@ -2,51 +2,66 @@ from pymarc import MARCReader
 import sys
 import csv
 import re
-from .oclc_api_helpers import getBriefBib, getToken, getSession
+from concurrent.futures import ThreadPoolExecutor
+from .oclc_api_helpers import getBriefBib, getToken, getSession, MAX_CONCURRENT_REQUESTS
 
 # USAGE: python process_withdrawals.py [Weeding|Withdrawals]/20241029/BIBLIOGRAPHIC_19342001100001401_19342001070001401_1.mrc
 
 filename = sys.argv[1]
-data_file = open('data_file.csv', 'w')
 
 fields = ['mmsid', 'title', 'bibno', 'oclcno', 'oclctitle']
 
-csv_writer = csv.DictWriter(data_file, fieldnames = fields, restval='', extrasaction='ignore')
+_PUNCT = re.compile(r"[^\w\s]")
+_OCLC = re.compile(r"\(OCoLC\)")
     
+# Millennium bib number -> OCLC number, for constant-time lookups per record
 with open('oclc-millennium.csv', 'r') as file:
     reader = csv.DictReader(file)
-    crosswalk = [row for row in reader]
+    crosswalk = {row["BIBNO"]: row["OCLCNO"] for row in reader}
 
-with open(filename, 'rb') as fh:
-    token = getToken()
-    session = getSession(token)
+# Collect (mmsid, title, bibno, oclc) for every record before going to the network
+records = []
+# A 1 MiB buffer keeps MARCReader's small leader/record reads from each hitting the disk
+with open(filename, 'rb', buffering=1 << 20) as fh:
     reader = MARCReader(fh, file_encoding='utf-8')
-    books = []
-    oclcNumbers = []
     for record in reader:
-        item = {}
         mmsid = record['001'].format_field()
         title = record.title
         print(title)
         try:
-            bibno = re.sub(r"[^\w\s]",'',record['907']['a'])
-            oclctag = next((item for item in crosswalk if item["BIBNO"] == bibno), None)
-            oclc = oclctag['OCLCNO']
-        except:
+            bibno = _PUNCT.sub('', record['907']['a'])
+        except (KeyError, TypeError):
+            bibno = None
+        oclc = crosswalk.get(bibno)
+        if oclc is None:
+            # Not in the crosswalk; fall back to the OCLC number in the 035
             bibno = None
             for f in record.get_fields('035'):
-                if re.search("OCoLC",f['a']):
-                    oclc = re.sub(r"\(OCoLC\)","",f['a'])
-        briefBib = getBriefBib(oclc, session)
-        item['mmsid'] = mmsid
-        item['title'] = title
-        item['bibno'] = bibno
-        item['oclcno'] = oclc
-        item['oclctitle'] = briefBib['title']
-        books.append(item)
-        oclcNumbers.append(oclc)
-
-csv_writer.writerows(books)
+                if "OCoLC" in f['a']:
+                    oclc = _OCLC.sub("", f['a'])
+        records.append((mmsid, title, bibno, oclc))
+
+# Look up the brief bibs concurrently; getBriefBib keeps the calls under OCLC's rate limit
+token = getToken()
+session = getSession(token)
+with session, ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+    briefBibs = list(executor.map(lambda record: getBriefBib(record[3], session), records))
+
+books = []
+oclcNumbers = []
+for (mmsid, title, bibno, oclc), briefBib in zip(records, briefBibs):
+    item = {}
+    item['mmsid'] = mmsid
+    item['title'] = title
+    item['bibno'] = bibno
+    item['oclcno'] = oclc
+    item['oclctitle'] = briefBib['title']
+    books.append(item)
+    oclcNumbers.append(oclc)
+
+with open('data_file.csv', 'w', newline='', buffering=1 << 20) as data_file:
+    csv_writer = csv.DictWriter(data_file, fieldnames = fields, restval='', extrasaction='ignore')
+    csv_writer.writerows(books)
 
 with open('oclcNumbers.txt', 'w+') as f:
     for items in oclcNumbers:
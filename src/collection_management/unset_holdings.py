@@ -20,17 +20,18 @@ def setup_logging():
         level=logging.INFO
     )
     logging.info("+" * 70)
-    logging.info(f"START OF UNSET LOG FOR {now}")
+    logging.info("START OF UNSET LOG FOR %s", now)
     logging.info("+" * 70)
 
 def main(filename):
     with open(filename, 'r') as file:
         token = getToken()
         session = getSession(token)
-        for line in file:
-            oclc_number = line.strip()
-            unsetResponse = holdingsUnset(oclc_number, session)
-            logging.info(f"Response: {unsetResponse}")
+        with session:
+            for line in file:
+                oclc_number = line.strip()
+                unsetResponse = holdingsUnset(oclc_number, session)
+                logging.info("Response: %s", unsetResponse)
         
 if __name__ == "__main__":
     filename = sys.argv[1]
@@ -4,12 +4,22 @@ Amazon CSV to EDIFACT EDI Converter
 Converts Amazon Business CSV invoice data to EDIFACT INVOIC format for Alma
 """
 
-import csv
 import datetime
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+import functools
+from typing import List, Optional, Tuple
+from dataclasses import dataclass, field
 import re
 
+import pandas as pd
+
+# Amazon columns holding money amounts, coerced to float (blank or invalid -> 0.0)
+AMAZON_FLOAT_COLUMNS = [
+    'Unit price excl. tax',
+    'Shipping and handling excl. tax',
+    'Promotions and discounts excl. tax',
+    'Total tax amount'
+]
+
 
 @dataclass
 class EDIFACTConfig:
@@ -23,6 +33,33 @@ class EDIFACTConfig:
     vendor_account: str = "amazon"  # Always "amazon" for Amazon Business orders
 
 
+@dataclass(slots=True)
+class LineItem:
+    """One Amazon CSV row, with its amounts already converted"""
+    asin: str = ''
+    title: str = ''
+    author: str = ''
+    quantity: int = 1
+    unit_price: float = 0.0
+    list_price: float = 0.0
+    shipping: float = 0.0
+    discounts: float = 0.0
+    tax_rate: str = ''
+    tax_amount: float = 0.0
+    pol: str = ''
+    sli_ref: str = '0'
+
+
+@dataclass(slots=True)
+class Invoice:
+    """One Amazon order, which becomes one INVOIC message"""
+    invoice_number: str
+    invoice_date: str
+    due_date: str = ''
+    api_ref: str = '7015-10'
+    line_items: List[LineItem] = field(default_factory=list)
+
+
 class EDIFACTInvoiceGenerator:
     """Generates EDIFACT INVOIC messages from Amazon CSV data"""
     
@@ -44,30 +81,28 @@ class EDIFACTInvoiceGenerator:
         
         return una + unb
     
-    def generate_invoice_segments(self, invoice_data: Dict[str, Any]) -> List[str]:
+    def generate_invoice_segments(self, invoice: Invoice) -> List[str]:
         """Generate all segments for a single invoice"""
         segments = []
         
         # UNH - Message Header
-        msg_ref = invoice_data.get('invoice_number', '1')
+        msg_ref = invoice.invoice_number
         segments.append(f"UNH+{msg_ref}+INVOIC:D:96A:UN:EAN008'")
         
         # BGM - Beginning of Message
-        invoice_num = invoice_data.get('invoice_number', '491150')
-        segments.append(f"BGM+380+{invoice_num}'")
+        segments.append(f"BGM+380+{invoice.invoice_number}'")
         
         # DTM - Date/Time (Invoice Date)
-        invoice_date = invoice_data.get('invoice_date', datetime.datetime.now().strftime("%Y%m%d"))
+        invoice_date = invoice.invoice_date
         segments.append(f"DTM+137:{invoice_date}:102'")
         
         # DTM - Date/Time (Due Date) - if available
-        due_date = invoice_data.get('due_date', '')
+        due_date = invoice.due_date
         if due_date and due_date != invoice_date:  # Only add if different from invoice date
             segments.append(f"DTM+13:{due_date}:102'")
         
         # RFF - Reference (API reference from your sample)
-        api_ref = invoice_data.get('api_ref', '7015-10')
-        segments.append(f"RFF+API:{api_ref}'")
+        segments.append(f"RFF+API:{invoice.api_ref}'")
         
         # RFF - Vendor Account Reference (from config)
         segments.append(f"RFF+VA:{self.config.vendor_account}'")
@@ -75,9 +110,19 @@ class EDIFACTInvoiceGenerator:
         # CUX - Currencies
         segments.append(f"CUX+2:{self.config.currency}:4'")
         
-        # Calculate charges
-        line_items = invoice_data.get('line_items', [])
-        shipping_total = sum(item.get('shipping', 0) for item in line_items)
+        # Calculate charges and totals in a single pass over the line items
+        line_items = invoice.line_items
+        shipping_total = 0
+        total_qty = 0
+        goods_total = 0
+        discounts_total = 0
+        total_tax = 0
+        for item in line_items:
+            shipping_total += item.shipping
+            total_qty += item.quantity
+            goods_total += item.unit_price * item.quantity
+            discounts_total += item.discounts
+            total_tax += item.tax_amount
         
         # ALC - Allowance or Charge (Freight)
         if shipping_total > 0:
@@ -86,22 +131,18 @@ class EDIFACTInvoiceGenerator:
         
         # Line items
         for i, item in enumerate(line_items, 1):
-            segments.extend(self.generate_line_item_segments(item, i))
+            self.generate_line_item_segments(item, i, segments)
         
         # UNS - Section Control
         segments.append("UNS+S'")
         
         # CNT - Control Total
         total_lines = len(line_items)
-        total_qty = sum(int(item.get('quantity', 1) or 1) for item in line_items)
         segments.append(f"CNT+1:{total_qty}'")
         segments.append(f"CNT+2:{total_lines}'")
         
         # MOA - Monetary Amount
-        gross_total = sum(item.get('unit_price', 0) * int(item.get('quantity', 1) or 1) 
-                         for item in line_items) + shipping_total
-        discounts_total = sum(item.get('discounts', 0) for item in line_items)
-        total_tax = sum(item.get('tax_amount', 0) for item in line_items)
+        gross_total = goods_total + shipping_total
         net_total = gross_total + discounts_total + total_tax  # Add tax to net total
         
         segments.append(f"MOA+9:{gross_total:.2f}'")
@@ -117,42 +158,41 @@ class EDIFACTInvoiceGenerator:
         
         return segments
     
-    def generate_line_item_segments(self, item: Dict[str, Any], line_num: int) -> List[str]:
-        """Generate segments for a single line item"""
-        segments = []
+    def generate_line_item_segments(self, item: LineItem, line_num: int,
+                                    segments: Optional[List[str]] = None) -> List[str]:
+        """Generate segments for a single line item, appending to segments if given"""
+        if segments is None:
+            segments = []
         
         # LIN - Line Item
-        asin = item.get('asin', '')
-        segments.append(f"LIN+{line_num}++{asin}:EN'")
+        segments.append(f"LIN+{line_num}++{item.asin}:EN'")
         
         # IMD - Item Description - Author
-        author = item.get('author', '').upper()
+        author = item.author.upper()
         if author:
             segments.append(f"IMD+L+010+:::{author}'")
         
         # IMD - Item Description - Title (may need multiple segments if long)
-        title = item.get('title', '').upper()
+        title = item.title.upper()
         title_segments = self.split_title_for_imd(title)
         for title_seg in title_segments:
             segments.append(f"IMD+L+050+:::{title_seg}'")
         
         # QTY - Quantity
-        quantity = item.get('quantity', '1') or '1'
-        segments.append(f"QTY+47:{quantity}'")
+        segments.append(f"QTY+47:{item.quantity}'")
         
         # MOA - Monetary Amount (line total)
-        unit_price = item.get('unit_price', 0)
-        line_total = unit_price * int(quantity)
+        unit_price = item.unit_price
+        line_total = unit_price * item.quantity
         segments.append(f"MOA+203:{line_total:.2f}'")
         
         # PRI - Price Details
-        list_price = item.get('list_price', unit_price)
-        segments.append(f"PRI+AAB:{list_price:.2f}'")
+        segments.append(f"PRI+AAB:{item.list_price:.2f}'")
         segments.append(f"PRI+AAA:{unit_price:.2f}'")
         
         # TAX - Duty/tax/fee details (if tax information available)
-        tax_rate = item.get('tax_rate', '')
-        tax_amount = item.get('tax_amount', 0)
+        tax_rate = item.tax_rate
+        tax_amount = item.tax_amount
         if tax_rate and tax_rate != '0':
             # TAX segment: TAX+7+VAT+++:::tax_rate
             segments.append(f"TAX+7+VAT+++:::{tax_rate}'")
@@ -161,12 +201,10 @@ class EDIFACTInvoiceGenerator:
                 segments.append(f"MOA+124:{tax_amount:.2f}'")
         
         # RFF - References
-        pol = item.get('pol', '')
-        if pol:
-            segments.append(f"RFF+LI:{pol}'")
+        if item.pol:
+            segments.append(f"RFF+LI:{item.pol}'")
         
-        sli_ref = item.get('sli_ref', '0')
-        segments.append(f"RFF+SLI:{sli_ref}'")
+        segments.append(f"RFF+SLI:{item.sli_ref}'")
         
         return segments
     
@@ -175,28 +213,29 @@ class EDIFACTInvoiceGenerator:
         if len(title) <= max_length:
             return [title]
         
-        # Try to split on word boundaries
-        words = title.split()
+        # Try to split on word boundaries. Track the pending words and their joined
+        # length instead of concatenating a trial string for every word.
         segments = []
-        current_segment = ""
-        
-        for word in words:
-            if len(current_segment + " " + word) <= max_length:
-                if current_segment:
-                    current_segment += " " + word
-                else:
-                    current_segment = word
+        current_words = []
+        current_length = 0
+        
+        for word in title.split():
+            if current_length + 1 + len(word) <= max_length:
+                current_length = current_length + 1 + len(word) if current_words else len(word)
+                current_words.append(word)
+            elif current_words:
+                segments.append(" ".join(current_words))
+                current_words = [word]
+                current_length = len(word)
             else:
-                if current_segment:
-                    segments.append(current_segment)
-                    current_segment = word
-                else:
-                    # Word is longer than max_length, force split
-                    segments.append(word[:max_length])
-                    current_segment = word[max_length:]
+                # Word is longer than max_length, force split
+                segments.append(word[:max_length])
+                remainder = word[max_length:]
+                current_words = [remainder] if remainder else []
+                current_length = len(remainder)
         
-        if current_segment:
-            segments.append(current_segment)
+        if current_words:
+            segments.append(" ".join(current_words))
         
         return segments
     
@@ -205,57 +244,67 @@ class EDIFACTInvoiceGenerator:
         return f"UNZ+{message_count}+{self.config.interchange_ref}'"
 
 
-def parse_amazon_csv(csv_file_path: str) -> List[Dict[str, Any]]:
-    """Parse Amazon Business CSV and group by invoice"""
-    invoices = {}
-    
-    with open(csv_file_path, 'r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        
-        for row in reader:
-            # Group by Order ID (which becomes our invoice number)
-            order_id = row.get('Order ID', '')
-            
-            if order_id not in invoices:
-                invoices[order_id] = {
-                    'invoice_number': order_id,
-                    'invoice_date': parse_date(row.get('Order date', '')),
-                    'due_date': parse_date(row.get('Invoice due date', '')),
-                    'api_ref': row.get('Family', '7015-10'),  # Use Family column for EAN/API reference
-                    'line_items': []
-                }
-            
-            # Extract author from title (simple heuristic)
-            title = row.get('Title', '')
-            author = extract_author_from_title(title)
-            
-            # Helper function to safely convert to float
-            def safe_float(value, default=0.0):
-                if value is None or value == '' or value == 'nan':
-                    return default
-                try:
-                    return float(value)
-                except (ValueError, TypeError):
-                    return default
-            
-            line_item = {
-                'asin': row.get('ASIN', ''),
-                'title': clean_title(title, author),
-                'author': author,
-                'quantity': row.get('Shipment Quantity', '1') or '1',
-                'unit_price': safe_float(row.get('Unit price excl. tax')),
-                'list_price': safe_float(row.get('Unit price excl. tax')),  # Amazon doesn't separate list price
-                'shipping': safe_float(row.get('Shipping and handling excl. tax')),
-                'discounts': safe_float(row.get('Promotions and discounts excl. tax')),
-                'tax_rate': row.get('Tax rate', '').replace('%', ''),  # Remove % symbol if present
-                'tax_amount': safe_float(row.get('Total tax amount')),
-                'pol': row.get('POL', ''),  # This is what you need to add to your CSV
-                'sli_ref': row.get('PO line item ID', '0') or '0'
-            }
-            
-            invoices[order_id]['line_items'].append(line_item)
-    
-    return list(invoices.values())
+def parse_amazon_csv(csv_file_path: str) -> List[Invoice]:
+    """Parse Amazon Business CSV and group by invoice
+
+    Amazon doesn't guarantee an order's rows are adjacent, so every row is read
+    before the invoices are returned.
+    """
+    # Tokenize in C and keep every cell as a string, like csv.DictReader
+    df = pd.read_csv(csv_file_path, dtype=str, keep_default_na=False, encoding='utf-8')
+    
+    def column(name: str, default: str = '') -> 'pd.Series':
+        if name in df.columns:
+            return df[name]
+        return pd.Series(default, index=df.index, dtype=object)
+    
+    # Coerce the money columns in one vectorized pass each
+    amounts = {name: pd.to_numeric(column(name), errors='coerce').fillna(0.0) for name in AMAZON_FLOAT_COLUMNS}
+    
+    # (title, author) per row, split apart with the .str accessor
+    title_authors = column('Title').map(split_title_author)
+    quantities = column('Shipment Quantity', '1')
+    sli_refs = column('PO line item ID', '0')
+    
+    # Columns in LineItem field order, so each row unpacks straight into one
+    line_items = pd.DataFrame({
+        'asin': column('ASIN'),
+        'title': title_authors.str[0],
+        'author': title_authors.str[1],
+        'quantity': quantities.mask(quantities == '', '1').map(int),
+        'unit_price': amounts['Unit price excl. tax'],
+        'list_price': amounts['Unit price excl. tax'],  # Amazon doesn't separate list price
+        'shipping': amounts['Shipping and handling excl. tax'],
+        'discounts': amounts['Promotions and discounts excl. tax'],
+        'tax_rate': column('Tax rate').str.replace('%', '', regex=False),  # Remove % symbol if present
+        'tax_amount': amounts['Total tax amount'],
+        'pol': column('POL'),  # This is what you need to add to your CSV
+        'sli_ref': sli_refs.mask(sli_refs == '', '0')
+    }).itertuples(index=False, name=None)
+    line_items = [LineItem(*row) for row in line_items]
+    
+    # Group by Order ID (which becomes our invoice number), keeping first-seen order;
+    # invoice-level fields come from each order's first row
+    order_ids = column('Order ID')
+    order_dates = column('Order date')
+    due_dates = column('Invoice due date')
+    families = column('Family', '7015-10')
+    
+    positions_by_order = order_ids.groupby(order_ids, sort=False).indices
+    
+    invoices = []
+    for order_id in order_ids.unique():
+        positions = positions_by_order[order_id]
+        first = positions[0]
+        invoices.append(Invoice(
+            invoice_number=order_id,
+            invoice_date=parse_date(order_dates.iat[first]),
+            due_date=parse_date(due_dates.iat[first]),
+            api_ref=families.iat[first],  # Use Family column for EAN/API reference
+            line_items=[line_items[i] for i in positions]
+        ))
+    
+    return invoices
 
 
 def extract_author_from_title(title: str) -> str:
@@ -263,16 +312,14 @@ def extract_author_from_title(title: str) -> str:
     # This is a simple heuristic - you might need to adjust based on your data
     # Look for patterns like "Author Name - Title" or "Title by Author Name"
     
-    if ' by ' in title.lower():
-        parts = title.split(' by ')
-        if len(parts) > 1:
-            return parts[-1].strip()
+    # Only an exact ' by ' splits, so there's no need to lowercase the whole title first
+    if ' by ' in title:
+        return title.split(' by ')[-1].strip()
     
-    if ' - ' in title:
-        parts = title.split(' - ')
-        # First part might be author if it's all caps or title case
-        if len(parts) > 1 and parts[0].isupper():
-            return parts[0].strip()
+    head, sep, _ = title.partition(' - ')
+    # First part might be author if it's all caps or title case
+    if sep and head.isupper():
+        return head.strip()
     
     return ""  # Return empty if no author pattern found
 
@@ -284,10 +331,40 @@ def clean_title(title: str, author: str) -> str:
     return title
 
 
+def split_title_author(title: str) -> Tuple[str, str]:
+    """Split an Amazon title into its cleaned title and extracted author"""
+    author = extract_author_from_title(title)
+    return clean_title(title, author), author
+
+
+# Formats for 10-character dates, keyed by (separator, index of the first separator)
+_DATE_FORMAT_BY_SHAPE = {
+    ('/', 2): '%m/%d/%Y',
+    ('-', 4): '%Y-%m-%d',
+    ('-', 2): '%m-%d-%Y',
+    ('/', 4): '%Y/%m/%d'
+}
+
+
 def parse_date(date_str: str) -> str:
     """Parse various date formats to YYYYMMDD"""
     if not date_str:
         return datetime.datetime.now().strftime("%Y%m%d")
+    return _parse_date_string(date_str)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date_string(date_str: str) -> str:
+    """Parse a non-empty date string; cached because dates repeat across an order's rows"""
+    # Zero-padded dates identify their format by where the first separator sits
+    if len(date_str) == 10:
+        sep_index = 4 if date_str[4] in '-/' else 2
+        fmt = _DATE_FORMAT_BY_SHAPE.get((date_str[sep_index], sep_index))
+        if fmt:
+            try:
+                return datetime.datetime.strptime(date_str, fmt).strftime("%Y%m%d")
+            except ValueError:
+                pass
     
     # Try common formats
     formats = ['%m/%d/%Y', '%Y-%m-%d', '%m-%d-%Y', '%Y/%m/%d']
@@ -314,35 +391,34 @@ def convert_amazon_csv_to_edifact(csv_file_path: str, edi_file_path: str, config
     if not invoices:
         raise ValueError("No invoice data found in CSV file")
     
-    # Print summary of what will be created
-    print(f"\n📋 Processing {len(invoices)} invoice(s):")
-    print("=" * 50)
+    # Print summary of what will be created, built up and printed in one call
+    summary = [f"\n📋 Processing {len(invoices)} invoice(s):", "=" * 50]
     
     total_line_items = 0
     for invoice in invoices:
-        line_count = len(invoice['line_items'])
+        line_count = len(invoice.line_items)
         total_line_items += line_count
-        print(f"Invoice: {invoice['invoice_number']} → {line_count} line item(s)")
+        summary.append(f"Invoice: {invoice.invoice_number} → {line_count} line item(s)")
     
-    print("=" * 50)
-    print(f"📊 Total: {len(invoices)} invoices, {total_line_items} line items")
-    print()
+    summary.append("=" * 50)
+    summary.append(f"📊 Total: {len(invoices)} invoices, {total_line_items} line items")
+    summary.append("")
+    print("\n".join(summary))
     
     # Generate EDI
     generator = EDIFACTInvoiceGenerator(config)
     
-    with open(edi_file_path, 'w', newline='', encoding='utf-8') as edi_file:
-        # Write headers
-        edi_file.write(generator.generate_una_unb_headers())
-        
-        # Write each invoice
+    # Headers, every invoice's segments, then the trailer. Each invoice's segments
+    # go to the (large) file buffer as soon as they're generated, so only one
+    # invoice's worth of EDI text is held at a time.
+    # The file is opened in binary mode and each invoice is encoded once as a whole,
+    # rather than a text-mode wrapper encoding segment by segment. Titles can carry
+    # non-ASCII characters, so the encoding stays UTF-8.
+    with open(edi_file_path, 'wb', buffering=1 << 20) as edi_file:
+        edi_file.write(generator.generate_una_unb_headers().encode('utf-8'))
         for invoice in invoices:
-            segments = generator.generate_invoice_segments(invoice)
-            for segment in segments:
-                edi_file.write(segment)
-        
-        # Write trailer
-        edi_file.write(generator.generate_unz_trailer(len(invoices)))
+            edi_file.write(''.join(generator.generate_invoice_segments(invoice)).encode('utf-8'))
+        edi_file.write(generator.generate_unz_trailer(len(invoices)).encode('utf-8'))
 
 
 def main():
@@ -1,81 +1,125 @@
 import re
 import os
+import mmap
 import sys
 import json
-from collections import OrderedDict
-from itertools import islice
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Data element (+) and component (:) separators are treated alike
+_SEG_RE = re.compile(r'[+:]')
 
 def read_edi_file(file_path):
     """Read the contents of an EDI file."""
     with open(file_path, 'r', encoding='utf-8') as file:
         return file.read()
 
+def iter_edi_segments(file_path):
+    """Yield the segments of an EDI file one at a time, decoding each on its own."""
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield ''
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            while (end := mm.find(b"'", start)) >= 0:
+                yield mm[start:end].decode('utf-8')
+                start = end + 1
+            # Whatever follows the last terminator, as str.split would return it
+            yield mm[start:].decode('utf-8')
+
+@dataclass
+class _ParseState:
+    """Where parse_edi is in the interchange, shared by the segment handlers."""
+    parsed_data: dict = field(default_factory=dict)
+    current_message_ref: Optional[str] = None
+    current_line_number: Optional[str] = None
+    # The message and line dicts being filled, so handlers don't re-walk parsed_data
+    current_message: Optional[dict] = None
+    current_line: Optional[dict] = None
+
+def _h_unh(elements, state):
+    # Start of a new message
+    state.current_message_ref = message_ref = elements[1]
+    state.current_message = state.parsed_data[message_ref] = {
+        'invoice_number': None,
+        'lines': {},
+        'totals': {}
+    }
+    state.current_line = None
+
+def _h_dtm(elements, state):
+    # contains invoice date
+    if state.current_message is not None and len(elements) > 2:
+        state.current_message['invoice_date'] = elements[2]
+
+def _h_bgm(elements, state):
+    # Beginning of Message - contains invoice number
+    if state.current_message is not None and len(elements) > 2:
+        state.current_message['invoice_number'] = elements[2]
+
+def _h_lin(elements, state):
+    # Line item
+    state.current_line_number = line_number = elements[1]
+    item_number = elements[3] if len(elements) > 3 else None
+    state.current_line = state.current_message['lines'][f'line_{line_number}'] = {
+        'item_number': item_number,
+        'description': [],
+        'quantity': None,
+        'amount': None
+    }
+
+def _h_imd(elements, state):
+    # Item description
+    if state.current_line is not None:
+        # A short segment slices to an empty list, which joins to ''
+        description = ' '.join(elements[4:])
+        state.current_line['description'].append(description.strip())
+
+def _h_qty(elements, state):
+    # Quantity
+    if state.current_line is not None:
+        state.current_line['quantity'] = elements[2] if len(elements) > 2 else None
+
+def _h_moa(elements, state):
+    # Monetary amount: MOA+<qualifier>:<amount>
+    if len(elements) > 2:
+        code, amount = elements[1], elements[2]
+        if code == '203' and state.current_line is not None:
+            # Line item amount
+            state.current_line['amount'] = amount
+        elif code == '9':
+            # Invoice total amount
+            state.current_message['totals']['invoice_total'] = amount
+
+# Segment name -> handler; segments without a handler are skipped
+_HANDLERS = {
+    'UNH': _h_unh,
+    'DTM': _h_dtm,
+    'BGM': _h_bgm,
+    'LIN': _h_lin,
+    'IMD': _h_imd,
+    'QTY': _h_qty,
+    'MOA': _h_moa
+}
+
 def parse_edi(edi_content):
-    # Split the EDI content into segments
-    segments = edi_content.split("'")
+    # Split the EDI content into segments, or take already-split segments
+    # (e.g. from iter_edi_segments) as they come
+    segments = edi_content.split("'") if isinstance(edi_content, str) else edi_content
     
-    parsed_data = OrderedDict()
-    current_message_ref = None
-    current_line_number = None
+    state = _ParseState()
     
     for segment in segments:
         # Split each segment into its elements
-        elements = re.split(r'\+|:', segment)
-        
-        # The first element is the segment name
-        segment_name = elements[0]
-        
-        if segment_name == 'UNH':
-            # Start of a new message
-            current_message_ref = elements[1]
-            parsed_data[current_message_ref] = OrderedDict([
-                ('invoice_number', None),
-                ('lines', OrderedDict()),
-                ('totals', OrderedDict())
-            ])
-        
-        elif segment_name == 'DTM':
-            # contains invoice date
-            if current_message_ref is not None and len(elements) > 2:
-                parsed_data[current_message_ref]['invoice_date'] = elements[2]
-        
-        elif segment_name == 'BGM':
-            # Beginning of Message - contains invoice number
-            if current_message_ref is not None and len(elements) > 2:
-                parsed_data[current_message_ref]['invoice_number'] = elements[2]
+        elements = _SEG_RE.split(segment)
         
-        elif segment_name == 'LIN':
-            # Line item
-            current_line_number = elements[1]
-            item_number = elements[3] if len(elements) > 3 else None
-            parsed_data[current_message_ref]['lines'][f'line_{current_line_number}'] = OrderedDict([
-                ('item_number', item_number),
-                ('description', []),
-                ('quantity', None),
-                ('amount', None)
-            ])
-        
-        elif segment_name == 'IMD':
-            # Item description
-            if current_line_number is not None:
-                description = ' '.join(elements[4:]) if len(elements) > 4 else ''
-                parsed_data[current_message_ref]['lines'][f'line_{current_line_number}']['description'].append(description.strip())
-        
-        elif segment_name == 'QTY':
-            # Quantity
-            if current_line_number is not None:
-                quantity = elements[2] if len(elements) > 2 else None
-                parsed_data[current_message_ref]['lines'][f'line_{current_line_number}']['quantity'] = quantity
-        
-        elif segment_name == 'MOA':
-            # Monetary amount
-            if len(elements) > 2:
-                if elements[1] == '203' and current_line_number is not None:
-                    # Line item amount
-                    parsed_data[current_message_ref]['lines'][f'line_{current_line_number}']['amount'] = elements[2]
-                elif elements[1] == '9':
-                    # Invoice total amount
-                    parsed_data[current_message_ref]['totals']['invoice_total'] = elements[2]
+        # The first element is the segment name; one dict lookup picks its handler
+        handler = _HANDLERS.get(elements[0])
+        if handler is not None:
+            handler(elements, state)
+    
+    parsed_data = state.parsed_data
     
     # Join the description list into a single string for each line item
     for message in parsed_data.values():
@@ -89,11 +133,8 @@ def main():
     file_in = sys.argv[1]
 
     try:
-        # Read the EDI file
-        edi_content = read_edi_file(file_in)
-        
-        # Parse the EDI content
-        parsed_data = parse_edi(edi_content)
+        # Stream the EDI file's segments straight into the parser
+        parsed_data = parse_edi(iter_edi_segments(file_in))
         
         # Print the parsed data
         # print(json.dumps(parsed_data, indent=2))
@@ -3,34 +3,123 @@
 import fitz  # PyMuPDF
 import sys
 import re
-import glob
 import csv
 from datetime import date, datetime
 import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+# Patterns are compiled once here; the tuples are fallbacks, tried in order
+_GOBI_POL_RE = re.compile(r'(POL-[0-9]{6}).*[0-9]{13} ([A-Z]+).*([0-9]+\.[0-9]{2})')
+_GOBI_TOTAL_RES = (
+    re.compile(r'Total US.*\$(.*)'),
+    re.compile(r'Total USD(.*)')
+)
+
+_RENEWAL_NUMBER_RES = (
+    re.compile(r'Renewal List Number\s+Account No\..*?(\d+)'),
+    re.compile(r'(\d{4})\s+SF-F-\d+-\d+')
+)
+_RENEWAL_TOTAL_RE = re.compile(r'Grand Total is in U S Dollars\s*([\d,]+\.[\d]{2})')
+_DASH_DATE_RE = re.compile(r'(\d{2}-\d{2}-\d{4})')
+_ILS_POL_RE = re.compile(r'ILS: (POL-\d+)')
+
+_EBSCO_INVOICE_RES = (
+    re.compile(r'Invoice No\.\s*(\d+)'),
+    # The REF. CODE field pattern (like 0587093)
+    re.compile(r'REF\.\s*CODE\s+INVOICE NO\.\s+PAGE NO\.\s+[^\d]*(\d+)'),
+    # 7-digit invoice numbers in the header area
+    re.compile(r'(\d{7})')
+)
+# The first pattern's \s* also spans the line break in the second PDF's format
+# ("Net Amount Due in U.S. Dollars" with the amount on the next line)
+_EBSCO_TOTAL_RES = (
+    re.compile(r'Net Amount Due in U\.S\. Dollars\s*([\d,]+\.[\d]{2})'),
+    # Alternative pattern without periods in "U.S."
+    re.compile(r'Net Amount Due.*?\$?([\d,]+\.[\d]{2})'),
+    # Simpler "Net Amount Due" pattern with flexible spacing, amount on a later line
+    re.compile(r'Net Amount Due\s+([\d,]+\.[\d]{2})')
+)
+# A header date (DATE REF. CODE ... MM-DD-YYYY) is already found by the first pattern
+_EBSCO_DATE_RES = (
+    _DASH_DATE_RE,
+    # MM/DD/YYYY format
+    re.compile(r'(\d{2}/\d{2}/\d{4})')
+)
+_POL_RE = re.compile(r'POL-\d+')
+_EBSCO_ACCOUNT_RES = (
+    re.compile(r'Account No\.\s*([A-Z0-9-]+)'),
+    re.compile(r'ACCOUNT NO\.\s+([A-Z0-9-]+)')
+)
+_EBSCO_PURCHASE_RES = (
+    re.compile(r'Your Purchase No\.\s*([A-Z0-9\s-]+)'),
+    re.compile(r'YOUR PURCHASE ORDER NO\.\s*([A-Z0-9\s-]+)')
+)
+
+# Configured at import so worker processes log the same way as the main one;
+# per-PDF detail is logged at DEBUG, warnings and the run summary at INFO and up
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+# PDFs read in parallel, one per worker process
+MAX_WORKERS = min(os.cpu_count() or 1, 6)
+
+# Plain-text extraction for the regexes: no image blocks, and ligatures come out
+# as their separate letters so words like "fi" match as typed
+TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES & ~fitz.TEXT_PRESERVE_IMAGES
 
 today = date.today()
 folder = sys.argv[1]
 
+def search_first(patterns, text):
+    """Return the match of the first pattern that matches text, or None"""
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match
+    return None
+
+def findall_first(patterns, text):
+    """Return the findall results of the first pattern that finds anything in text"""
+    for pattern in patterns:
+        matches = pattern.findall(text)
+        if matches:
+            return matches
+    return []
+
+def find_pols(text):
+    """Find every POL number in one pass, grouped by the label in front of it
+    
+    Returns a tuple of the POLs after "ILS: ", the POLs after "ILS Number:",
+    and all POLs, each in the order they appear.
+    """
+    ils_pols = []
+    ils_number_pols = []
+    all_pols = []
+    for match in _POL_RE.finditer(text):
+        pol = match.group()
+        start = match.start()
+        if start >= 5 and text.startswith('ILS: ', start - 5):
+            ils_pols.append(pol)
+        elif start >= 11 and text.startswith('ILS Number:', start - 11):
+            ils_number_pols.append(pol)
+        all_pols.append(pol)
+    return ils_pols, ils_number_pols, all_pols
+
 def extract_gobi_data(text, filename):
     """Extract data from GOBI invoice format"""
     pdf = filename.split("/")[-1]  # Get just the filename
     invoice_number = pdf.split("-")[2].strip(r"\.pdf")
     
-    pols = re.findall(r'(POL-[0-9]{6}).*[0-9]{13} ([A-Z]+).*([0-9]+\.[0-9]{2})', text)
-    total = re.findall(r'Total US.*\$(.*)', text)
-    if not total:
-        total = re.findall(r'Total USD(.*)', text)
+    pols = _GOBI_POL_RE.findall(text)
+    total = findall_first(_GOBI_TOTAL_RES, text)
     
     if not total:
         total = ['0']
-        print(f"WARNING: No Total Price found for GOBI invoice# {invoice_number}")
-    
-    pol_list = []
-    for pol in pols:
-        pol_fund = f"{pol[0]} ({pol[1]})"
-        pol_list.append(pol_fund)
+        logger.warning("WARNING: No Total Price found for GOBI invoice# %s", invoice_number)
     
-    pol_string = str.join(" ", pol_list)
+    # Each match is (POL, fund, amount); list them as "POL (fund)"
+    pol_string = " ".join([f"{pol} ({fund})" for pol, fund, _ in pols])
     invoice_total = total[0].replace(" ", "")
     invoice_date = pdf.split("-")[1]
     
@@ -38,7 +127,7 @@ def extract_gobi_data(text, filename):
         date_object = datetime.strptime(invoice_date, "%m%d%y")
         new_date_string = date_object.strftime("%m/%d/%y")
     except ValueError:
-        print(f"WARNING: Could not parse date {invoice_date} for GOBI invoice")
+        logger.warning("WARNING: Could not parse date %s for GOBI invoice", invoice_date)
         new_date_string = invoice_date
     
     return {
@@ -58,26 +147,24 @@ def extract_ebsco_data(text, filename):
     is_renewal_list = 'ANNUAL RENEWAL LIST' in text or 'Renewal List Number' in text
     is_regular_invoice = 'Invoice No.' in text or 'INVOICE' in text
     
-    print(f"EBSCO Detection for {pdf}: renewal_list={is_renewal_list}, regular_invoice={is_regular_invoice}")
+    logger.debug("EBSCO Detection for %s: renewal_list=%s, regular_invoice=%s", pdf, is_renewal_list, is_regular_invoice)
     
     if is_renewal_list:
-        print(f"Processing {pdf} as EBSCO renewal list")
+        logger.debug("Processing %s as EBSCO renewal list", pdf)
         # Extract renewal list number as invoice number
-        renewal_match = re.search(r'Renewal List Number\s+Account No\..*?(\d+)', text)
-        if not renewal_match:
-            renewal_match = re.search(r'(\d{4})\s+SF-F-\d+-\d+', text)
+        renewal_match = search_first(_RENEWAL_NUMBER_RES, text)
         invoice_number = renewal_match.group(1) if renewal_match else "Unknown"
         
         # Extract grand total
-        total_match = re.search(r'Grand Total is in U S Dollars\s*([\d,]+\.[\d]{2})', text)
+        total_match = _RENEWAL_TOTAL_RE.search(text)
         if total_match:
             invoice_total = total_match.group(1).replace(',', '')
         else:
             invoice_total = '0'
-            print(f"WARNING: No Grand Total found for EBSCO renewal list# {invoice_number}")
+            logger.warning("WARNING: No Grand Total found for EBSCO renewal list# %s", invoice_number)
         
         # Extract date from renewal list
-        date_match = re.search(r'(\d{2}-\d{2}-\d{4})', text)
+        date_match = _DASH_DATE_RE.search(text)
         if date_match:
             try:
                 date_object = datetime.strptime(date_match.group(1), "%m-%d-%Y")
@@ -86,62 +173,38 @@ def extract_ebsco_data(text, filename):
                 invoice_date = date_match.group(1)
         else:
             invoice_date = "Unknown"
-            print(f"WARNING: Could not parse date for EBSCO renewal list# {invoice_number}")
+            logger.warning("WARNING: Could not parse date for EBSCO renewal list# %s", invoice_number)
         
         # Extract all POL numbers from the renewal list
-        pol_matches = re.findall(r'ILS: (POL-\d+)', text)
+        pol_matches = _ILS_POL_RE.findall(text)
         if pol_matches:
             # Remove duplicates and sort
-            unique_pols = sorted(list(set(pol_matches)))
+            unique_pols = sorted(set(pol_matches))
             pol_string = " ".join(unique_pols)
-            print(f"Found {len(unique_pols)} unique POL numbers: {pol_string[:100]}...")
+            logger.debug("Found %d unique POL numbers: %s...", len(unique_pols), pol_string[:100])
         else:
             pol_string = "No POL Info"
-            print(f"WARNING: No POL numbers found in EBSCO renewal list# {invoice_number}")
+            logger.warning("WARNING: No POL numbers found in EBSCO renewal list# %s", invoice_number)
     
     elif is_regular_invoice:
-        print(f"Processing {pdf} as EBSCO regular invoice")
+        logger.debug("Processing %s as EBSCO regular invoice", pdf)
         # Handle regular EBSCO invoice format - try multiple patterns
         
         # Extract invoice number - try multiple patterns
-        invoice_match = re.search(r'Invoice No\.\s*(\d+)', text)
-        if not invoice_match:
-            # Try the REF. CODE field pattern (like 0587093)
-            invoice_match = re.search(r'REF\.\s*CODE\s+INVOICE NO\.\s+PAGE NO\.\s+[^\d]*(\d+)', text)
-        if not invoice_match:
-            # Try to find it in the header area - 7-digit invoice numbers
-            invoice_match = re.search(r'(\d{7})', text)
+        invoice_match = search_first(_EBSCO_INVOICE_RES, text)
         invoice_number = invoice_match.group(1) if invoice_match else "Unknown"
         
         # Extract total amount - try multiple patterns
-        total_match = re.search(r'Net Amount Due in U\.S\. Dollars\s*([\d,]+\.[\d]{2})', text)
-        if not total_match:
-            # Try the format from the second invoice type: "Net Amount Due in U.S. Dollars"
-            total_match = re.search(r'Net Amount Due in U\.S\. Dollars\s+([\d,]+\.[\d]{2})', text)
-        if not total_match:
-            # Alternative pattern without periods in "U.S."
-            total_match = re.search(r'Net Amount Due.*?\$?([\d,]+\.[\d]{2})', text)
-        if not total_match:
-            # Try simpler "Net Amount Due" pattern with flexible spacing
-            total_match = re.search(r'Net Amount Due\s+([\d,]+\.[\d]{2})', text)
-        if not total_match:
-            # Try pattern that matches the exact format in the second PDF
-            total_match = re.search(r'Net Amount Due in U\.S\. Dollars\s*\n?\s*([\d,]+\.[\d]{2})', text, re.MULTILINE)
+        total_match = search_first(_EBSCO_TOTAL_RES, text)
         
         if total_match:
             invoice_total = total_match.group(1).replace(',', '')
         else:
             invoice_total = '0'
-            print(f"WARNING: No Total Price found for EBSCO invoice# {invoice_number}")
+            logger.warning("WARNING: No Total Price found for EBSCO invoice# %s", invoice_number)
         
         # Extract date - try multiple date patterns
-        date_match = re.search(r'(\d{2}-\d{2}-\d{4})', text)
-        if not date_match:
-            # Try MM/DD/YYYY format
-            date_match = re.search(r'(\d{2}/\d{2}/\d{4})', text)
-        if not date_match:
-            # Try the date field pattern from the invoice header
-            date_match = re.search(r'DATE\s+REF\.\s*CODE.*?(\d{2}-\d{2}-\d{4})', text)
+        date_match = search_first(_EBSCO_DATE_RES, text)
         
         if date_match:
             try:
@@ -155,30 +218,21 @@ def extract_ebsco_data(text, filename):
                 invoice_date = date_match.group(1)
         else:
             invoice_date = "Unknown"
-            print(f"WARNING: Could not parse date for EBSCO invoice# {invoice_number}")
+            logger.warning("WARNING: Could not parse date for EBSCO invoice# %s", invoice_number)
         
         # For regular invoices, look for POL numbers in multiple patterns
-        pol_matches = re.findall(r'ILS: (POL-\d+)', text)
-        if not pol_matches:
-            # Try alternative POL pattern
-            pol_matches = re.findall(r'ILS Number:(POL-\d+)', text)
-        if not pol_matches:
-            # Try without "ILS:" prefix
-            pol_matches = re.findall(r'(POL-\d+)', text)
+        # "ILS: " POLs first, then "ILS Number:" ones, then any POL at all
+        ils_pols, ils_number_pols, all_pols = find_pols(text)
+        pol_matches = ils_pols or ils_number_pols or all_pols
         
         if pol_matches:
-            unique_pols = sorted(list(set(pol_matches)))
+            unique_pols = sorted(set(pol_matches))
             pol_string = " ".join(unique_pols)
-            print(f"Found {len(unique_pols)} POL numbers in regular invoice")
+            logger.debug("Found %d POL numbers in regular invoice", len(unique_pols))
         else:
             # Fallback to account/reference info
-            account_match = re.search(r'Account No\.\s*([A-Z0-9-]+)', text)
-            if not account_match:
-                account_match = re.search(r'ACCOUNT NO\.\s+([A-Z0-9-]+)', text)
-            
-            ref_match = re.search(r'Your Purchase No\.\s*([A-Z0-9\s-]+)', text)
-            if not ref_match:
-                ref_match = re.search(r'YOUR PURCHASE ORDER NO\.\s*([A-Z0-9\s-]+)', text)
+            account_match = search_first(_EBSCO_ACCOUNT_RES, text)
+            ref_match = search_first(_EBSCO_PURCHASE_RES, text)
             
             pol_info = []
             if account_match:
@@ -189,7 +243,7 @@ def extract_ebsco_data(text, filename):
             pol_string = " ".join(pol_info) if pol_info else "No POL Info"
     
     else:
-        print(f"WARNING: Could not determine EBSCO document type for {pdf}")
+        logger.warning("WARNING: Could not determine EBSCO document type for %s", pdf)
         # Default handling
         invoice_number = "Unknown"
         invoice_total = "0"
@@ -208,11 +262,11 @@ def extract_ebsco_data(text, filename):
 def detect_vendor(text, filename):
     """Detect vendor type based on PDF content"""
     filename_lower = filename.lower()
-    text_lower = text.lower()
     
     if 'gobi' in filename_lower:
         return 'gobi'
-    elif 'ebsco' in text_lower or 'EBSCO' in text or 'SF-F-' in text:
+    # Case-sensitive checks first; a lowercased copy of the text is only made if they miss
+    elif 'EBSCO' in text or 'SF-F-' in text or 'ebsco' in text.lower():
         return 'ebsco'
     elif 'POL-' in text:  # POL- could be in EBSCO or GOBI, check after specific vendor detection
         # If we see POL- but no clear vendor, try to determine from context
@@ -221,7 +275,7 @@ def detect_vendor(text, filename):
         else:
             return 'gobi'   # GOBI format uses POL- differently
     else:
-        print(f"WARNING: Unknown vendor for file {filename}")
+        logger.warning("WARNING: Unknown vendor for file %s", filename)
         return 'unknown'
 
 def extract_invoice_data(text, filename, vendor_type):
@@ -248,114 +302,110 @@ def merge_pdfs_with_pymupdf(input_files, output_path):
     
     for file_path in input_files:
         try:
-            doc = fitz.open(file_path)
-            merged_doc.insert_pdf(doc)
-            doc.close()
-            print(f"Added {file_path} to merged PDF")
+            # Closed even if the insert fails partway
+            with fitz.open(file_path) as doc:
+                merged_doc.insert_pdf(doc)
+            # Drop what MuPDF cached for the closed source so it doesn't pile up
+            fitz.TOOLS.store_shrink(100)
+            logger.debug("Added %s to merged PDF", file_path)
         except Exception as e:
-            print(f"Error merging {file_path}: {e}")
+            logger.error("Error merging %s: %s", file_path, e)
     
-    merged_doc.save(output_path)
+    # Drop unused and duplicate objects (invoices share fonts) and compress streams
+    merged_doc.save(output_path, garbage=4, deflate=True)
     merged_doc.close()
-    print(f"Merged PDF saved as: {output_path}")
+    logger.info("Merged PDF saved as: %s", output_path)
+
+def process_one(file):
+    """Read one PDF and return its CSV row, or None if it's empty or unreadable"""
+    logger.debug("Processing: %s", file)
+    try:
+        # Use PyMuPDF to read PDF
+        doc = fitz.open(file)
+        
+        if len(doc) == 0:
+            logger.warning("WARNING: %s appears to be empty", file)
+            doc.close()
+            return None
+        
+        # Extract all text from PDF, joining the pages once rather than growing a string
+        text = ''.join([page.get_text("text", flags=TEXT_FLAGS) for page in doc])
+        
+        doc.close()
+        
+        # Detect vendor and extract data
+        vendor_type = detect_vendor(text, file)
+        invoice_data = extract_invoice_data(text, file, vendor_type)
+        
+        # Create row for CSV
+        row = [
+            invoice_data['filename'],
+            invoice_data['invoice_number'],
+            invoice_data['invoice_date'],
+            invoice_data['vendor'],
+            invoice_data['pol_fund'],
+            invoice_data['total']
+        ]
+        
+        logger.debug("Extracted: %s", row)
+        return row
+        
+    except Exception as e:
+        logger.error("Error processing %s: %s", file, e)
+        return None
 
 def main():
-    # Get all PDF files
-    files = glob.glob(f"{folder}/*.pdf")
-    files.sort()
+    # Get all PDF files (skipping hidden ones, as the *.pdf glob this replaced did)
+    # from a single directory scan
+    with os.scandir(folder) as entries:
+        files = sorted(entry.path for entry in entries
+                       if entry.name.endswith('.pdf') and not entry.name.startswith('.')
+                       and entry.is_file())
     rows = []
 
-    # Process all files (no batching)
-    for file in files:
-        print(f"Processing: {file}")
-        try:
-            # Use PyMuPDF to read PDF
-            doc = fitz.open(file)
-            
-            if len(doc) == 0:
-                print(f"WARNING: {file} appears to be empty")
-                doc.close()
-                continue
-            
-            # Extract all text from PDF
-            text = ''
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text += page.get_text()
-            
-            doc.close()
-            
-            # Detect vendor and extract data
-            vendor_type = detect_vendor(text, file)
-            invoice_data = extract_invoice_data(text, file, vendor_type)
-            
-            # Create row for CSV
-            row = [
-                invoice_data['filename'],
-                invoice_data['invoice_number'],
-                invoice_data['invoice_date'],
-                invoice_data['vendor'],
-                invoice_data['pol_fund'],
-                invoice_data['total']
-            ]
-            
-            print(f"Extracted: {row}")
-            rows.append(row)
-            
-        except Exception as e:
-            print(f"Error processing {file}: {e}")
-            continue
+    # Process the files in worker processes (PyMuPDF holds the GIL while it
+    # extracts text, so threads wouldn't overlap); map keeps the sorted order
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for row in executor.map(process_one, files):
+            if row is not None:
+                rows.append(row)
 
     # Write the full CSV
     fields = ['PDF Filename','Invoice Number','Invoice Date','Vendor','POL (Fund)','Total']
     csv_filename = f'{folder}/Olin-Invoices-{today}.csv'
-    with open(csv_filename, 'w') as csvfile:
+    with open(csv_filename, 'w', newline='', encoding='utf-8', buffering=1 << 16) as csvfile:
         csvwriter = csv.writer(csvfile)
         csvwriter.writerow(fields)
         csvwriter.writerows(rows)
 
-    print(f"Full CSV file created: {csv_filename}")
+    logger.info("Full CSV file created: %s", csv_filename)
 
     # Create summary CSV file with just the 4 key columns
     summary_fields = ['Invoice Number', 'Invoice Date', 'Vendor', 'Amount']
     summary_csv_filename = f'{folder}/Olin-Invoices-Summary-{today}.csv'
-    with open(summary_csv_filename, 'w') as csvfile:
+    with open(summary_csv_filename, 'w', newline='', encoding='utf-8', buffering=1 << 16) as csvfile:
         csvwriter = csv.writer(csvfile)
         csvwriter.writerow(summary_fields)
         
-        # Extract the 4 key columns from each row
-        for row in rows:
-            summary_row = [
-                row[1],  # Invoice Number
-                row[2],  # Invoice Date
-                row[3],  # Vendor
-                row[5]   # Total (Amount)
-            ]
-            csvwriter.writerow(summary_row)
+        # Extract the 4 key columns from each row: Invoice Number, Invoice Date,
+        # Vendor and Total (Amount)
+        csvwriter.writerows([row[1], row[2], row[3], row[5]] for row in rows)
 
-    print(f"Summary CSV file created: {summary_csv_filename}")
-    print(f"Processed {len(rows)} invoices total")
+    logger.info("Summary CSV file created: %s", summary_csv_filename)
+    logger.info("Processed %d invoices total", len(rows))
 
     # Create merged PDF with all invoices in the same order as the summary CSV file
     if rows:  # Only create merged PDF if there are processed invoices
-        # Create list of full file paths in the same order as the CSV data
-        files_to_merge = []
-        for row in rows:
-            pdf_filename = row[0]  # First column is PDF Filename
-            full_path = os.path.join(folder, pdf_filename)
-            if os.path.exists(full_path):
-                files_to_merge.append(full_path)
-            else:
-                print(f"WARNING: Could not find file {full_path} for merging")
+        # Create list of full file paths in the same order as the CSV data. Every row
+        # came from a file the scan above found, so there's no need to stat them again;
+        # merge_pdfs_with_pymupdf reports any that can't be opened.
+        files_to_merge = [os.path.join(folder, row[0]) for row in rows]  # First column is PDF Filename
         
-        if files_to_merge:
-            merged_pdf_filename = f'{folder}/All-Invoices-Combined-{today}.pdf'
-            merge_pdfs_with_pymupdf(files_to_merge, merged_pdf_filename)
-            print(f"All invoices merged into: {merged_pdf_filename}")
-        else:
-            print("WARNING: No valid PDF files found for merging")
+        merged_pdf_filename = f'{folder}/All-Invoices-Combined-{today}.pdf'
+        merge_pdfs_with_pymupdf(files_to_merge, merged_pdf_filename)
+        logger.info("All invoices merged into: %s", merged_pdf_filename)
     else:
-        print("No invoices were processed - no merged PDF created")
+        logger.info("No invoices were processed - no merged PDF created")
     
 if __name__ == "__main__":
     main()
\ No newline at end of file